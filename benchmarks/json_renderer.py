@@ -0,0 +1,68 @@
+"""Serialization time of NodeResource-shaped payloads of generated graphs: Cornice's stdlib JSON renderer against
+``honeycomb.renderers.dumps`` with orjson and with its standard library fallback.
+
+    python benchmarks/json_renderer.py [--nodes 100 1000 10000] [--repeat 20]"""
+
+import argparse
+import random
+import timeit
+import uuid
+
+from cornice.renderer import CorniceRenderer
+from pyramid import testing
+
+from honeycomb import renderers
+
+
+def graph_payload(size, degree=3):
+    "A node payload with ``size`` children and ``size * degree`` edges, ids as UUID objects like the models use"
+    ids = [uuid.uuid4() for n in range(size)]
+    return {
+        "id": uuid.uuid4(),
+        "label": "Paisaje temático",
+        "contents": "",
+        "url": "http://localhost:6543/abejas/mapa-sitio/",
+        "iconUrl": None,
+        "nodes": [{"id": node_id, "label": f"Nodo {n}", "url": f"http://localhost:6543/abejas/nodo-{n}/"} for n, node_id in enumerate(ids)],
+        "edges": [
+            {"source": source, "target": random.choice(ids), "id": uuid.uuid4().hex, "label": "", "type": "custom-label", "data": {"hasArrow": False}}
+            for source in ids for k in range(degree)
+        ],
+        "next": None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    testing.setUp()
+    request = testing.DummyRequest()
+    stdlib = CorniceRenderer()
+    stdlib.add_adapter(uuid.UUID, lambda obj, request: str(obj))
+    render_stdlib = stdlib(None)
+    fast = renderers.FastJSONRenderer()(None)
+    orjson = renderers.orjson
+
+    print(f"{'nodes':>7} {'cornice stdlib':>15} {'fast (orjson)':>15} {'fast (stdlib)':>15} {'bytes':>10}")
+    for size in args.nodes:
+        payload = graph_payload(size)
+        system = {'request': request}
+        times = [min(timeit.repeat(lambda: render(payload, system), number=1, repeat=args.repeat))
+                 for render in (render_stdlib, fast)]
+        renderers.orjson = None
+        try:
+            times.append(min(timeit.repeat(lambda: fast(payload, system), number=1, repeat=args.repeat)))
+        finally:
+            renderers.orjson = orjson
+        print(f"{size:>7} " + ' '.join(f"{seconds * 1000:>12.2f} ms" for seconds in times)
+              + f" {len(fast(payload, system)):>10}")
+    testing.tearDown()
+    if orjson is None:
+        print("orjson isn't installed: both fast columns use the standard library")
+
+
+if __name__ == '__main__':
+    main()
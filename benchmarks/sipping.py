@@ -0,0 +1,98 @@
+"""Throughput of ``POST /api/v1/sipping/{nodeid}`` under concurrent writers, for each sipping store backend.
+
+    python benchmarks/sipping.py [--writers 8] [--requests 500]
+
+Every configuration gets a fresh database and log directory. The requests go through the whole WSGI stack
+(pyramid_tm, CSRF check, JSON rendering) in-process, so the numbers compare the stores, not the network. The batched
+and write-behind configurations answer before their records are committed or synced."""
+
+import argparse
+import contextlib
+import io
+import tempfile
+import threading
+import time
+import logging
+import os
+
+import webtest
+
+from honeycomb import main
+
+
+CONFIGURATIONS = [
+    ('zodb', {}),
+    ('batched', {}),
+    ('segments fsync=always', {'honeycomb.sipping.fsync': 'always'}),
+    ('segments fsync=batch', {'honeycomb.sipping.fsync': 'batch'}),
+    ('segments fsync=never', {'honeycomb.sipping.fsync': 'never'}),
+]
+
+
+def make_app(directory, name, overrides):
+    settings = {
+        'auth.secret': 'benchmark',
+        'retry.attempts': '3',
+        'zodbconn.uri': f'file://{directory}/Data.fs',
+        'honeycomb.sipping.store': name.split()[0],
+        'honeycomb.sipping.path': os.path.join(directory, 'sipping'),
+    }
+    settings.update(overrides)
+    return main({}, **settings)
+
+
+def run(app, writers, requests):
+    barrier = threading.Barrier(writers + 1)
+    errors = []
+
+    def writer(n):
+        client = webtest.TestApp(app)
+        client.set_cookie('csrf_token', 'benchmark')
+        barrier.wait()
+        for i in range(requests):
+            # Cada escritor usa sus propias llaves, como lo harían usuarios distintos
+            try:
+                response = client.post_json(f'/api/v1/sipping/node-{n}-{i % 50}', {'puntos': i, 'escritor': n},
+                                            headers={'X-CSRF-Token': 'benchmark'}, expect_errors=True)
+            except Exception as error:
+                # Conflictos que agotaron los reintentos de pyramid_retry
+                errors.append(type(error).__name__)
+                continue
+            if response.status_int != 200:
+                errors.append(response.status)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, errors
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help="POSTs per writer")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    total = args.writers * args.requests
+    print(f"{args.writers} writers x {args.requests} POSTs")
+    for name, overrides in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as directory:
+            app = make_app(directory, name, overrides)
+            # La primera petición crea la raíz con los datos de ejemplo
+            with contextlib.redirect_stdout(io.StringIO()):
+                webtest.TestApp(app).get('/api/v1/honeycombs')
+            elapsed, errors = run(app, args.writers, args.requests)
+            for backend in (app.registry.sipping_store, app.registry.sipping_queue):
+                if backend is not None:
+                    backend.close()
+            app.registry._zodb_databases[''].close()
+        print(f"{name:24} {total / elapsed:9.0f} req/s  {elapsed:7.2f} s  {len(errors)} errors")
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -1,8 +1,11 @@
+import zlib
+
 from pyramid.config import Configurator
 from pyramid.session import SignedCookieSessionFactory
 from pyramid_zodbconn import get_connection
 
 from .models import appmaker
+from .renderers import FastJSONRenderer
 
 
 def _first_proxy_header(environ, name):
@@ -83,6 +86,108 @@ class ForwardedHeadersMiddleware:
         return getattr(self.app, name)
 
 
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+# gzip y deflate (formato zlib, como lo define HTTP), en orden de preferencia
+ENCODING_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def _accepted_encoding(environ):
+    """Best encoding the client accepts, honouring q-values; None if it accepts neither."""
+    accepted = {}
+    for part in environ.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[token.strip().lower()] = quality
+    candidates = [(accepted.get(name, accepted.get("*", 0.0)), -rank, name)
+                  for rank, name in enumerate(ENCODING_WBITS)]
+    quality, _, name = max(candidates)
+    return name if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """Compress textual responses with gzip or deflate while they stream, when the client accepts it. Bodies shorter
+    than ``threshold`` bytes, already encoded, marked ``no-transform`` or event streams are left alone."""
+
+    def __init__(self, app, threshold=1024, level=6):
+        self.app = app
+        self.threshold = threshold
+        self.level = level
+        self.registry = getattr(app, "registry", None)
+
+    def _should_compress(self, status, headers):
+        if status[:3] in ("204", "206", "304") or int(status[:3]) < 200:
+            return False
+        values = {name.lower(): value for name, value in headers}
+        content_type = values.get("content-type", "").split(";")[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES) or content_type == "text/event-stream":
+            return False
+        if "content-encoding" in values or "no-transform" in values.get("cache-control", ""):
+            return False
+        length = values.get("content-length")
+        return length is None or not length.isdigit() or int(length) >= self.threshold
+
+    def __call__(self, environ, start_response):
+        encoding = _accepted_encoding(environ)
+        if encoding is None or environ.get("REQUEST_METHOD") == "HEAD":
+            return self.app(environ, start_response)
+
+        compressor = started = None
+
+        def compressing_start_response(status, headers, exc_info=None):
+            nonlocal compressor, started
+            started = True
+            if not self._should_compress(status, headers):
+                compressor = None
+                return start_response(status, headers, exc_info)
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, ENCODING_WBITS[encoding])
+            vary = [value for name, value in headers if name.lower() == "vary"]
+            headers = [(name, value) for name, value in headers if name.lower() not in ("content-length", "vary")]
+            headers.append(("Content-Encoding", encoding))
+            headers.append(("Vary", ", ".join(vary + ["Accept-Encoding"])))
+            # La representación comprimida ya no es idéntica byte a byte
+            headers = [(name, f"W/{value}" if name.lower() == "etag" and not value.startswith("W/") else value)
+                       for name, value in headers]
+            write = start_response(status, headers, exc_info)
+
+            def compressing_write(data):
+                chunk = compressor.compress(data)
+                if chunk:
+                    write(chunk)
+            return compressing_write
+
+        app_iter = self.app(environ, compressing_start_response)
+        if started and compressor is None:
+            return app_iter
+        # Las aplicaciones pueden llamar a start_response hasta producir el primer bloque
+        return self._compress(app_iter, lambda: compressor)
+
+    @staticmethod
+    def _compress(app_iter, get_compressor):
+        try:
+            for data in app_iter:
+                compressor = get_compressor()
+                chunk = compressor.compress(data) if compressor is not None else data
+                if chunk:
+                    yield chunk
+            compressor = get_compressor()
+            if compressor is not None:
+                yield compressor.flush()
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+
+    def __getattr__(self, name):
+        return getattr(self.app, name)
+
+
 def root_factory(request):
     conn = get_connection(request)
     return appmaker(conn.root())
@@ -104,11 +209,25 @@ def main(global_config, **settings):
         config.include('pyramid_zodbconn')
         config.include('.routes')
         config.include('.security')
+        config.include('.workers')
+        config.include('.urls')
+        config.include('.cache')
+        config.include('.sipping')
+        config.include('.live')
         config.include('cornice')
+        # Reemplaza el renderer JSON que registra cornice
+        config.add_renderer('cornicejson', FastJSONRenderer())
         config.set_root_factory(root_factory)
         config.scan()
     app = config.make_wsgi_app()
 
+    if settings.get('honeycomb.compression', 'false').lower() == 'true':
+        app = CompressionMiddleware(
+            app,
+            threshold=int(settings.get('honeycomb.compression.threshold', 1024)),
+            level=int(settings.get('honeycomb.compression.level', 6)),
+        )
+
     use_proxy_headers = settings.get('honeycomb.use_proxy_headers', 'false').lower() == 'true'
     if use_proxy_headers:
         return ForwardedHeadersMiddleware(app)
@@ -0,0 +1,83 @@
+"""In-process caches of serialized responses, validated against the ZODB serials of the objects they were built from."""
+
+from collections import OrderedDict
+import hashlib
+import threading
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache of bytes or str values, bounded both in entries and in total size."""
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.size = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            value = self.data.get(key)
+            if value is None:
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.data.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.data[key] = value
+            self.size += size
+            while len(self.data) > self.max_entries or self.size > self.max_bytes:
+                evicted_key, evicted = self.data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+
+def state_tag(objects, *extra):
+    """Hashes the oids and serials of persistent objects, plus any extra strings, into a tag which changes whenever
+    one of the objects is committed. Returns None if an object is new or has uncommitted changes, since its serial
+    doesn't describe its state then."""
+    digest = hashlib.blake2b(digest_size=16)
+    for obj in objects:
+        obj._p_activate()
+        if obj._p_oid is None or obj._p_changed:
+            return None
+        digest.update(obj._p_oid)
+        digest.update(obj._p_serial)
+    for value in extra:
+        digest.update(str(value).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_cache(request, name):
+    "Returns the named response cache of the application, creating it with the configured bounds"
+    caches = request.registry.response_caches
+    cache = caches.get(name)
+    if cache is None:
+        settings = request.registry.settings
+        cache = caches.setdefault(name, LRUCache(
+            int(settings.get(f'honeycomb.cache.{name}.max_entries', settings.get('honeycomb.cache.max_entries', 1024))),
+            int(settings.get(f'honeycomb.cache.{name}.max_bytes', settings.get('honeycomb.cache.max_bytes', 32 * 1024 * 1024))),
+        ))
+    return cache
+
+
+def includeme(config):
+    config.registry.response_caches = {}
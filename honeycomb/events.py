@@ -0,0 +1,138 @@
+"""Write-behind queue applying high-frequency events to the database in batches, one transaction per batch."""
+
+from collections import deque
+import logging
+import threading
+import time
+
+import transaction
+from ZODB.POSException import ConflictError
+
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    "The queue reached its maximum depth; the caller should ask the client to retry later"
+
+
+class EventQueue:
+    """Collects ``(key, payload)`` events in memory and applies them with ``apply(root, key, payload)`` from a
+    background thread. A batch is flushed when ``batch_size`` events are waiting or every ``flush_interval`` seconds,
+    and committed in a single transaction on the thread's own connection. On ConflictError the batch is replayed
+    on a fresh state, up to ``attempts`` times.
+
+    The latest queued payload of each key is kept in ``latest`` until its batch is committed, so readers see their
+    own writes before they reach the database."""
+
+    def __init__(self, db, apply, batch_size=500, flush_interval=0.5, max_depth=10000, attempts=5):
+        self.db = db
+        self.apply = apply
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.attempts = attempts
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.events = deque()
+        self.latest = {}
+        self.closed = False
+        self.counters = dict.fromkeys(('queued', 'committed', 'batches', 'conflicts', 'rejected', 'failed'), 0)
+        self.latencies = deque(maxlen=1000)
+        self.thread = threading.Thread(target=self._flush_loop, name='honeycomb-events', daemon=True)
+        self.thread.start()
+
+    def put(self, key, payload):
+        event = (key, payload)
+        with self.lock:
+            if self.closed or len(self.events) >= self.max_depth:
+                self.counters['rejected'] += 1
+                raise QueueFull(key)
+            self.events.append(event)
+            self.latest[key] = event
+            self.counters['queued'] += 1
+            if len(self.events) >= self.batch_size:
+                self.wakeup.notify()
+
+    def get(self, key, default=None):
+        "The latest payload queued for the key and not committed yet"
+        event = self.latest.get(key)
+        return event[1] if event is not None else default
+
+    def flush(self):
+        "Applies and commits the next batch of events; returns how many were committed"
+        with self.flush_lock:
+            with self.lock:
+                batch = [self.events.popleft() for n in range(min(len(self.events), self.batch_size))]
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            committed = self._commit(batch)
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                for event in batch:
+                    if self.latest.get(event[0]) is event:
+                        del self.latest[event[0]]
+                self.latencies.append(elapsed)
+                self.counters['batches'] += 1
+                self.counters['committed' if committed else 'failed'] += len(batch)
+            return len(batch) if committed else 0
+
+    def _commit(self, batch):
+        tm = transaction.TransactionManager()
+        conn = self.db.open(tm)
+        try:
+            for attempt in range(self.attempts):
+                try:
+                    tm.begin()
+                    root = conn.root()['app_root']
+                    for key, payload in batch:
+                        self.apply(root, key, payload)
+                    tm.get().note(f'{len(batch)} queued events')
+                    tm.commit()
+                    return True
+                except ConflictError:
+                    tm.abort()
+                    with self.lock:
+                        self.counters['conflicts'] += 1
+                    log.debug("Conflict committing %d events, attempt %d", len(batch), attempt + 1)
+                except Exception:
+                    tm.abort()
+                    log.exception("Dropping a batch of %d events", len(batch))
+                    return False
+            log.error("Dropping a batch of %d events after %d conflicts", len(batch), self.attempts)
+            return False
+        finally:
+            conn.close()
+
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                if not self.closed and len(self.events) < self.batch_size:
+                    self.wakeup.wait(self.flush_interval)
+                done = self.closed and not self.events
+            if done:
+                return
+            self.flush()
+
+    def metrics(self):
+        with self.lock:
+            last = self.latencies[-1] if self.latencies else None
+            latencies = sorted(self.latencies)
+            metrics = dict(self.counters, depth=len(self.events))
+        if latencies:
+            metrics['flush_latency_ms'] = {
+                'last': round(last * 1000, 3),
+                'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+                'p95': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3),
+            }
+        return metrics
+
+    def close(self):
+        "Stops accepting events and waits until the queued ones are flushed"
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify()
+        self.thread.join()
@@ -0,0 +1,168 @@
+"""Push of the graph changes to live clients as server-sent events, one stream per honeycomb.
+
+Each stream holds a server thread for as long as it's open, so the number of subscribers and the life of each stream
+are bounded: clients reconnect when a stream ends (EventSource does it by itself) and catch up with the change feed
+from the tid of the last event they got."""
+
+import json
+import logging
+import queue
+import threading
+import time
+
+from .models import changes
+
+
+log = logging.getLogger(__name__)
+
+# Aviso de cierre a los suscriptores
+_closed = object()
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """The events of one honeycomb for one client, in a bounded queue. A client too slow to keep up is dropped
+    instead of growing the queue: it gets a ``reset`` event and has to resync."""
+
+    def __init__(self, broker, honeycomb, queue_size):
+        self.broker = broker
+        self.honeycomb = honeycomb
+        self.events = queue.Queue(queue_size)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            log.info("Dropping a subscriber of %s which fell behind", self.honeycomb)
+            self.overflowed = True
+            self.broker.unsubscribe(self)
+
+    def get(self, timeout):
+        "The next event, None if there was none for ``timeout`` seconds, or ``_closed``"
+        if self.overflowed:
+            return _closed
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class ChangeBroker:
+    """Fans the changes of each commit out to the subscriptions of the honeycombs they belong to, and streams each
+    subscription's events"""
+
+    def __init__(self, queue_size=100, max_subscribers=2, heartbeat=15.0, max_duration=300.0, retry=3.0):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+        self.retry = retry
+        self.lock = threading.Lock()
+        self.subscriptions = {}  # honeycomb -> set de suscripciones
+        self.count = 0
+
+    def subscribe(self, honeycomb):
+        with self.lock:
+            if self.count >= self.max_subscribers:
+                raise TooManySubscribers
+            subscription = Subscription(self, honeycomb, self.queue_size)
+            self.subscriptions.setdefault(honeycomb, set()).add(subscription)
+            self.count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.honeycomb, set())
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self.count -= 1
+                if not subscriptions:
+                    del self.subscriptions[subscription.honeycomb]
+
+    def publish(self, tid, found):
+        by_honeycomb = {}
+        for change in found:
+            if change.get('honeycomb') is not None:
+                by_honeycomb.setdefault(change['honeycomb'], []).append(change)
+        for honeycomb, honeycomb_changes in by_honeycomb.items():
+            with self.lock:
+                subscriptions = list(self.subscriptions.get(honeycomb, ()))
+            if not subscriptions:
+                continue
+            event_id = changes.format_tid(tid) if tid else None
+            event = format_event('change', {'tid': event_id, 'changes': honeycomb_changes}, event_id)
+            for subscription in subscriptions:
+                subscription.push(event)
+
+    def stream(self, subscription, tid):
+        """The event stream of a subscription: a ``ready`` event with the tid the client is in sync with, then the
+        changes, with a comment line every ``heartbeat`` seconds of silence so proxies keep the connection and
+        closed connections are noticed. Ends after ``max_duration`` seconds to free the server thread."""
+        return EventStream(self._events(subscription, tid), subscription)
+
+    def _events(self, subscription, tid):
+        deadline = time.monotonic() + self.max_duration
+        yield f'retry: {int(self.retry * 1000)}\n'.encode('ascii')
+        yield format_event('ready', {'tid': changes.format_tid(tid)}, changes.format_tid(tid))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = subscription.get(min(self.heartbeat, remaining))
+            if event is _closed:
+                if subscription.overflowed:
+                    yield format_event('reset', {'reason': 'Client too slow, resync from the change feed'})
+                return
+            yield event if event is not None else b': heartbeat\n\n'
+
+    def close(self):
+        with self.lock:
+            subscriptions = [s for group in self.subscriptions.values() for s in group]
+        for subscription in subscriptions:
+            subscription.push(_closed)
+
+
+class EventStream:
+    "WSGI app iterator of a subscription's events. Closing it ends the subscription, even if it was never iterated"
+
+    def __init__(self, events, subscription):
+        self.events = events
+        self.subscription = subscription
+
+    def __iter__(self):
+        return self.events
+
+    def close(self):
+        self.events.close()
+        self.subscription.close()
+
+
+def format_event(name, data, event_id=None):
+    lines = [f'event: {name}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def get_broker(request):
+    return request.registry.change_broker
+
+
+def includeme(config):
+    settings = config.get_settings()
+    broker = ChangeBroker(
+        queue_size=int(settings.get('honeycomb.live.queue_size', 100)),
+        max_subscribers=int(settings.get('honeycomb.live.max_subscribers', 2)),
+        heartbeat=float(settings.get('honeycomb.live.heartbeat', 15)),
+        max_duration=float(settings.get('honeycomb.live.max_duration', 300)),
+    )
+    config.registry.change_broker = broker
+    changes.listeners.append(broker.publish)
@@ -0,0 +1,176 @@
+"""Streaming aggregates of the sipping interactions, per node and per honeycomb, updated as records are written."""
+
+from bisect import bisect_right
+import hashlib
+import json
+
+from persistent import Persistent
+from BTrees._OOBTree import OOBTree, OOTreeSet
+from BTrees.Length import Length
+from pyramid import traversal
+
+from .beehive import Honeycomb
+
+
+# Límites de las cubetas del histograma de puntajes, en porcentaje
+SCORE_BUCKETS = (0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+
+class Sum(Persistent):
+    "Like BTrees.Length, a conflict-free float accumulator: concurrent changes are added together"
+
+    def __init__(self, value=0.0):
+        self.value = value
+
+    def __getstate__(self):
+        return self.value
+
+    def __setstate__(self, value):
+        self.value = value
+
+    def change(self, delta):
+        self.value += delta
+
+    def __call__(self):
+        return self.value
+
+    def _p_resolveConflict(self, old, committed, new):
+        return committed + new - old
+
+
+class InteractionStats(Persistent):
+    """Counters of the interactions with a node or honeycomb. Every counter is its own conflict-free object, so
+    concurrent interactions update them without conflicts, and reading them costs the same at any volume."""
+
+    def __init__(self):
+        self.attempts = Length()
+        self.completions = Length()
+        self.users = Length()
+        # Usuarios distintos, para los agregados de varios nodos
+        self.user_ids = OOTreeSet()
+        self.scored = Length()
+        self.score_sum = Sum()
+        self.histogram = tuple(Length() for bucket in SCORE_BUCKETS[:-1])
+
+    def apply(self, old, new, user=None):
+        """Updates the counters with the change from a user's previous record to the new one. Given the ``user``,
+        it counts once however many nodes they interact with; otherwise every new record is a new user, which
+        holds for the stats of a single node."""
+        self.apply_summaries(None if old is None else summarize(old), summarize(new), user)
+
+    def apply_summaries(self, old, new, user=None):
+        "Same as ``apply``, from the ``summarize`` tuples of the records; ``old`` is None for a user's first record"
+        old_attempts, old_completed, old_score = old or (None, False, None)
+        new_attempts, new_completed, new_score = new
+        if user is not None:
+            user_ids = getattr(self, 'user_ids', None)
+            if user_ids is None:
+                # Estadísticas anteriores al conjunto de usuarios: honeycomb-migrate interaction-stats las recalcula
+                user_ids = self.user_ids = OOTreeSet()
+            if user_ids.insert(user):
+                self.users.change(1)
+        elif old is None:
+            self.users.change(1)
+        # Sin lista de interacciones, cada registro cuenta como un intento
+        self.attempts.change(max(new_attempts - (old_attempts or 0), 0) if new_attempts is not None else 1)
+        if old_completed != new_completed:
+            self.completions.change(1 if new_completed else -1)
+        if old_score is not None:
+            self.scored.change(-1)
+            self.score_sum.change(-old_score)
+            self.histogram[score_bucket(old_score)].change(-1)
+        if new_score is not None:
+            self.scored.change(1)
+            self.score_sum.change(new_score)
+            self.histogram[score_bucket(new_score)].change(1)
+
+    def to_dict(self):
+        scored = self.scored()
+        return {
+            'attempts': self.attempts(),
+            'completions': self.completions(),
+            'users': self.users(),
+            'scored_users': scored,
+            'average_score': self.score_sum() / scored if scored else None,
+            'histogram': [
+                {'min': low, 'max': high, 'count': bucket()}
+                for low, high, bucket in zip(SCORE_BUCKETS, SCORE_BUCKETS[1:], self.histogram)
+            ],
+        }
+
+
+def summarize(record):
+    """Reads the attempts, completion and score of a sipping record: the length of ``interacciones_previas``
+    (None without that list), ``estadisticas.completado`` and ``estadisticas.puntaje``"""
+    if not isinstance(record, dict):
+        return None, False, None
+    interactions = record.get('interacciones_previas')
+    attempts = len(interactions) if isinstance(interactions, list) else None
+    stats = record.get('estadisticas')
+    stats = stats if isinstance(stats, dict) else {}
+    score = stats.get('puntaje')
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        score = None
+    return attempts, bool(stats.get('completado')), score
+
+
+def score_bucket(score):
+    "Histogram bucket of a score; scores outside of SCORE_BUCKETS fall in the first or last bucket"
+    return min(max(bisect_right(SCORE_BUCKETS, score) - 1, 0), len(SCORE_BUCKETS) - 2)
+
+
+def find_honeycomb(root, node_id):
+    "Name of the honeycomb containing a node, looked up in the catalog or the node index"
+    catalog = getattr(root, '__catalog__', None)
+    node = catalog.get(node_id) if catalog is not None else None
+    if node is None:
+        nodes = getattr(root, '__nodes__', None)
+        node = nodes.get(node_id) if nodes is not None else None
+    for ancestor in traversal.lineage(node) if node is not None else ():
+        if isinstance(ancestor, Honeycomb):
+            return ancestor.__name__
+    return None
+
+
+def stats_for(root, index, key, create=False):
+    "The InteractionStats under a key of one of the beehive's stats trees, ``__node_stats__`` or ``__hc_stats__``"
+    tree = getattr(root, index, None)
+    if tree is None:
+        if not create:
+            return None
+        tree = OOBTree()
+        setattr(root, index, tree)
+    stats = tree.get(key)
+    if stats is None and create:
+        stats = tree[key] = InteractionStats()
+    return stats
+
+
+def update_stats(root, key, old, new):
+    "Applies the change of a ``user:node`` sipping record to the stats of the node and of its honeycomb"
+    _update_summaries(root, key, None if old is None else summarize(old), summarize(new))
+
+
+def _update_summaries(root, key, old, new):
+    # Los ids de los nodos no llevan ':', los de los usuarios sí pueden llevarlos
+    user, node_id = key.rsplit(':', 1) if ':' in key else (None, key)
+    stats_for(root, '__node_stats__', node_id, create=True).apply_summaries(old, new)
+    hc_name = find_honeycomb(root, node_id)
+    if hc_name is not None:
+        stats_for(root, '__hc_stats__', hc_name, create=True).apply_summaries(old, new, user)
+
+
+def apply_record(root, key, value):
+    """Updates the stats with a sipping record kept outside of the database, from a batch of the event queue. The
+    delta is taken from the summary of the last record applied for the key, kept in ``__stats_applied__`` and
+    committed along with the stats, so applying the same record again (a retried request) changes nothing."""
+    applied = getattr(root, '__stats_applied__', None)
+    if applied is None:
+        applied = root.__stats_applied__ = OOBTree()
+    digest = hashlib.blake2b(json.dumps(value, sort_keys=True).encode('utf-8'), digest_size=8).digest()
+    previous = applied.get(key)
+    if previous is not None and previous[1] == digest:
+        return
+    new = summarize(value)
+    applied[key] = (new, digest)
+    _update_summaries(root, key, previous[0] if previous is not None else None, new)
@@ -3,6 +3,8 @@
 from collections import namedtuple
 from collections.abc import Sequence
 from persistent import Persistent
+from BTrees._OOBTree import OOBTree
+from BTrees.Length import Length
 from pyramid import traversal
 import numpy as np
 from scipy import spatial
@@ -21,9 +23,17 @@ class CellBuilder(Persistent):
     @staticmethod
     def fill_cell(cell, *values, **kwvalues):
         cell.__axes__ = JellyPack(*values, **kwvalues)
+        explorer = find_explorer(cell)
+        if explorer is not None:
+            explorer.mark_dirty(cell)
 
     def set_walls(self, cell, limits):
+        """Sets the access limits of a cell. A cell without a container yet is added to the container's WallIndex
+        when it's stored in it, see ``update_walls``."""
         cell.__limits__ = {k:limits[k] for k in limits if k in self.__axes__}
+        container = getattr(cell, '__parent__', None)
+        if container is not None and container.get(cell.__name__) is cell:
+            update_walls(container, cell.__name__, cell, self.__axes__)
 
     @staticmethod
     def set_badge(cell, badge):
@@ -37,24 +47,282 @@ class CellBuilder(Persistent):
                     return False
         return True
 
+    @staticmethod
+    def visible_cells(container, user):
+        """Returns the (name, cell) pairs of the container the user has access to. The limits of all the walled
+        cells are compared at once against the user's stats with the container's WallIndex."""
+        walls = getattr(container, '__walls__', None)
+        blocked = walls.blocked(user) if walls is not None else ()
+        return [(name, cell) for name, cell in container.items() if name not in blocked]
+
+
+def update_walls(container, name, cell=None, axes=AXES_LABELS_DEFAULT):
+    """Keeps the row of the ``name`` child in the container's WallIndex in step with the limits of ``cell``, the
+    child now stored under that name, or None once it's gone. Called by the containers as children are set and
+    deleted."""
+    limits = getattr(cell, '__limits__', None) if cell is not None else None
+    walls = getattr(container, '__walls__', None)
+    if limits is not None:
+        if walls is None:
+            walls = container.__walls__ = WallIndex(axes)
+        walls.set(name, limits)
+    elif walls is not None:
+        walls.remove(name)
+
+
+class WallIndex(Persistent):
+    """The access limits of the walled cells of a container as a NumPy array, one row per cell and one column per
+    axis. Axes without a limit hold -inf."""
+    def __init__(self, axes=AXES_LABELS_DEFAULT):
+        self.axes = tuple(axes)
+        self.names = []
+        self.limits = np.empty((0, len(self.axes)))
+
+    def set(self, name, limits):
+        row = np.array([limits.get(axis, -np.inf) for axis in self.axes], dtype=float)
+        if name in self.names:
+            index = self.names.index(name)
+            self.limits = np.vstack([self.limits[:index], row, self.limits[index + 1:]])
+        else:
+            self.names = self.names + [name]
+            self.limits = np.vstack([self.limits, row])
+
+    def remove(self, name):
+        if name in self.names:
+            index = self.names.index(name)
+            self.names = self.names[:index] + self.names[index + 1:]
+            self.limits = np.delete(self.limits, index, axis=0)
+
+    def stats_vector(self, user):
+        "The user's stats in axes order; missing stats (or anonymous users) count as -inf"
+        stats = (user.get_stats() if user is not None else None) or {}
+        return np.array([-np.inf if stats.get(axis) is None else stats[axis] for axis in self.axes], dtype=float)
+
+    def blocked(self, user):
+        "Names of the cells whose limits the user doesn't reach, computed in a single pass"
+        if not self.names:
+            return set()
+        denied = np.any(self.stats_vector(user) < self.limits, axis=1)
+        return {self.names[index] for index in np.flatnonzero(denied)}
+
+
+def find_explorer(resource):
+    "Returns the HoneycombExplorer of the honeycomb containing the resource, if any"
+    for ancestor in traversal.lineage(resource):
+        explorer = getattr(ancestor, '__explorer__', None)
+        if explorer is not None:
+            return explorer
+    return None
+
+
+class CondensedMatrix(Persistent):
+    """A symmetric distance matrix stored in condensed (``pdist``) form as float32 bytes. It lives in its own record,
+    so loading the explorer doesn't load it, and ``condensed()`` maps the stored bytes without copying them."""
+    def __init__(self, square):
+        self.set(square)
+
+    def set(self, square):
+        square = np.asarray(square, dtype=np.float32)
+        self.size = len(square)
+        self.data = spatial.distance.squareform(square, checks=False).tobytes() if self.size > 1 else b''
+
+    def set_condensed(self, condensed, size):
+        self.size = size
+        self.data = np.asarray(condensed, dtype=np.float32).tobytes()
+
+    def condensed(self):
+        return np.frombuffer(self.data, dtype=np.float32)
+
+    def _row_indices(self, row):
+        "Positions in the condensed form of the distances between ``row`` and every other row, in row order"
+        others = np.delete(np.arange(self.size), row)
+        low, high = np.minimum(others, row), np.maximum(others, row)
+        return self.size * low - low * (low + 1) // 2 + high - low - 1
+
+    def set_row(self, row, distances):
+        "Replaces the distances of a row, given to every row in order; the one to itself is ignored"
+        condensed = self.condensed().copy()
+        condensed[self._row_indices(row)] = np.delete(np.asarray(distances), row)
+        self.data = condensed.tobytes()
+
+    def append(self, distances):
+        "Adds a last row, with its distances to the current rows"
+        # La distancia al nuevo renglón va al final de cada renglón i, que termina en la suma de n - 1 - k, k <= i
+        ends = np.cumsum(np.arange(self.size - 1, -1, -1))
+        self.set_condensed(np.insert(self.condensed(), ends, distances), self.size + 1)
+
+    def delete(self, row):
+        self.set_condensed(np.delete(self.condensed(), self._row_indices(row)), self.size - 1)
+
+    def square(self):
+        if self.size == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        return spatial.distance.squareform(self.condensed())
+
 
 class HoneycombExplorer(Persistent):
     "Helper to create, update and employ the honeycomb node distance matrix"
     def __init__(self, honeycomb):
         self.__hc__ = honeycomb
         self.names = []
-        self.matrix = None
+        self.distances = None
+        # Índice de pertenencia: id de celda -> renglón de la matriz
+        self.members = OOBTree()
+        self.coords = np.empty((0, len(AXES_LABELS_DEFAULT)))
+        # Cambios de celdas aún no aplicados: id -> celda, o None si fue eliminada
+        self.pending = OOBTree()
+        self.version = Length()
+
+    @property
+    def matrix(self):
+        "Square float32 distance matrix, or None if it hasn't been computed"
+        distances = getattr(self, 'distances', None)
+        if distances is None:
+            # Exploradores anteriores guardaban la matriz cuadrada float64 en el propio registro
+            return self.__dict__.get('matrix')
+        return distances.square()
+
+    @matrix.setter
+    def matrix(self, square):
+        distances = getattr(self, 'distances', None)
+        self.__dict__.pop('matrix', None)
+        if square is None:
+            self.distances = None
+        elif distances is None:
+            self.distances = CondensedMatrix(square)
+        else:
+            distances.set(square)
+
+    def mark_dirty(self, cell, removed=False):
+        """Queues a cell change for the next ``refresh``. Only the ``pending`` BTree is written, so concurrent cell
+        edits don't conflict on the explorer record."""
+        if getattr(self, 'pending', None) is None:
+            self.pending = OOBTree()
+        self.pending[str(cell.id)] = None if removed else cell
+
+    @property
+    def dirty(self):
+        return getattr(self, 'distances', None) is None or bool(getattr(self, 'pending', None))
+
+    @property
+    def computed(self):
+        "Whether there is a matrix to answer from, which may be missing the ``pending`` changes"
+        return self._is_indexed()
+
+    @property
+    def etag(self):
+        "Identifies the current version of the matrix"
+        version = getattr(self, 'version', None)
+        return f"{self.__hc__.id}-{version() if version is not None else 0}"
+
+    def refresh(self):
+        "Applies the queued cell changes to the matrix, row by row, and bumps its version"
+        pending = getattr(self, 'pending', None)
+        changes = list(pending.items()) if pending else []
+        if getattr(self, 'members', None) is None or getattr(self, 'distances', None) is None:
+            self.update_matrix()
+        for node_id, cell in changes:
+            if cell is None:
+                self.remove_cell(node_id)
+            else:
+                self.update_cell(cell)
+            del pending[node_id]
+        if getattr(self, 'version', None) is None:
+            self.version = Length()
+        self.version.change(1)
+
+    def _is_indexed(self):
+        return getattr(self, 'members', None) is not None and getattr(self, 'distances', None) is not None
+
+    def update_cell(self, cell):
+        "Adds or moves a cell in the matrix, recomputing only its row and column"
+        if not getattr(cell, '__axes__', None):
+            return self.remove_cell(cell)
+        if getattr(self, 'members', None) is None:
+            # Explorador anterior al índice: se reconstruye completo en update_matrix
+            return
+        self._condensed()
+        point = np.asarray(cell.__axes__, dtype=float)
+        node_id = str(cell.id)
+        row = self.members.get(node_id)
+        distances = np.linalg.norm(self.coords - point, axis=1)
+        if row is None:
+            self.distances.append(distances)
+            self.coords = np.vstack([self.coords, point])
+            self.members[node_id] = len(self.names)
+            self.names = self.names + [cell]
+        else:
+            self.distances.set_row(row, distances)
+            coords = self.coords.copy()
+            coords[row] = point
+            self.coords = coords
+
+    def _condensed(self):
+        "The CondensedMatrix, created from the square matrix of older explorers, or empty"
+        if getattr(self, 'distances', None) is None:
+            matrix = self.matrix
+            self.matrix = matrix if matrix is not None else np.empty((0, 0))
+        return self.distances
+
+    def remove_cell(self, cell):
+        "Drops a cell's row and column from the matrix, the cell may be given by id"
+        if not self._is_indexed():
+            return
+        row = self.members.pop(cell if isinstance(cell, str) else str(cell.id), None)
+        if row is None:
+            return
+        for node_id, other in list(self.members.items()):
+            if other > row:
+                self.members[node_id] = other - 1
+        self.distances.delete(row)
+        self.coords = np.delete(self.coords, row, axis=0)
+        self.names = self.names[:row] + self.names[row + 1:]
+
+    def kdtree(self):
+        "Spatial index over the member coordinates, rebuilt only after the coordinates change"
+        cached = getattr(self, '_v_kdtree', None)
+        if cached is None or cached[0] is not self.coords:
+            cached = self._v_kdtree = (self.coords, spatial.cKDTree(self.coords))
+        return cached[1]
+
+    def neighbours(self, cell_id, k=5):
+        "Returns up to ``k`` (cell, distance) pairs nearest to the given member cell, excluding itself"
+        row = self.members.get(str(cell_id)) if self._is_indexed() else None
+        if row is None:
+            return None
+        # Se pide un vecino extra porque la propia celda aparece a distancia cero
+        count = min(k + 1, len(self.names))
+        distances, rows = self.kdtree().query(self.coords[row], k=count)
+        pairs = zip(np.atleast_1d(distances), np.atleast_1d(rows))
+        return [(self.names[other], float(distance)) for distance, other in pairs if other != row][:k]
+
+    def within(self, cell_id, radius):
+        "Returns the (cell, distance) pairs at most ``radius`` away from the given member cell, nearest first"
+        row = self.members.get(str(cell_id)) if self._is_indexed() else None
+        if row is None:
+            return None
+        rows = [other for other in self.kdtree().query_ball_point(self.coords[row], radius) if other != row]
+        distances = np.linalg.norm(self.coords[rows] - self.coords[row], axis=1)
+        return [(self.names[rows[i]], float(distances[i])) for i in np.argsort(distances, kind='stable')]
 
     def update_matrix(self):
-        "Iterates through the beehive nodes and recalculates distance matrix based on the axes values of nodes belonging to the chosen Honeycomb"
-        root = traversal.find_root(self.__hc__)
-        names = []
-        coords = []
-        for node_id, node in root.__nodes__.items():
-            path = traversal.resource_path_tuple(node)
-            if path and path[1] == self.__hc__.__name__:
-                if getattr(node, '__axes__', None):
-                    names.append(node)
-                    coords.append(node.__axes__)
-        self.matrix = spatial.distance_matrix(np.array(coords), np.array(coords))
+        """Recalculates the whole distance matrix from the axes values of the member cells. Explorers created before
+        the membership index existed find their cells by iterating through the beehive nodes."""
+        if getattr(self, 'members', None) is not None:
+            names = [node for node in self.names if getattr(node, '__axes__', None)]
+        else:
+            root = traversal.find_root(self.__hc__)
+            names = []
+            for node_id, node in root.__nodes__.items():
+                path = traversal.resource_path_tuple(node)
+                if path and path[1] == self.__hc__.__name__:
+                    if getattr(node, '__axes__', None):
+                        names.append(node)
+        coords = [node.__axes__ for node in names]
+        coords = np.array(coords, dtype=float).reshape(-1, len(AXES_LABELS_DEFAULT))
+        if getattr(self, 'distances', None) is None:
+            self.matrix = np.empty((0, 0))
+        self.distances.set_condensed(spatial.distance.pdist(coords), len(coords))
+        self.coords = coords
         self.names = names
+        self.members = OOBTree({str(node.id): row for row, node in enumerate(names)})
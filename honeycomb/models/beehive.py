@@ -1,11 +1,39 @@
 from zope.interface import Interface, implementer
 from persistent import Persistent
-from persistent.mapping import PersistentMapping
-from BTrees._OOBTree import OOBTree
+from .folder import BTreeList, Folder
+from .edges import EdgeSet, edge_key
+from .axes import find_explorer, update_walls
+from .catalog import TextIndex
+from .changes import current_transaction, record_change, UPSERT, DELETE
+from .layout import MAX_NODES, pivot_layout, stress_layout
+from BTrees._OOBTree import OOBTree, OOTreeSet
 from persistent.list import PersistentList
-import json, uuid
+import json, logging, uuid
 
-class BeeHive(PersistentMapping):
+log = logging.getLogger(__name__)
+
+# Funciones llamadas con cada grafo que un commit dejó con el layout pendiente
+layout_listeners = []
+
+
+def edge_target(edge):
+    "Returns the id of the node an edge points at, both for plain dict edges and CellEdge objects"
+    if isinstance(edge, dict):
+        return edge.get("target")
+    to_node = getattr(edge, "to_node", None)
+    return str(to_node.id) if to_node is not None else None
+
+
+def honeycomb_name(node):
+    "Name of the honeycomb containing a node, None for nodes outside of every honeycomb"
+    while node is not None:
+        if isinstance(node, Honeycomb):
+            return node.__name__
+        node = getattr(node, '__parent__', None)
+    return None
+
+
+class BeeHive(Folder):
     """A container of Honeycombs. This represents the top-level hierarchy which gives entry to honeycombs. It should
     display the user a mosaic view of available honeycombs, highlighting already completed and recently visited ones,
     as well as those featured by creators and managers."""
@@ -18,30 +46,197 @@ class BeeHive(PersistentMapping):
         self.title = "BeeHive Root"
         self.__nodes__ = OOBTree()
         self.__edges__ = OOBTree()
+        # Índice inverso: id destino -> ids de origen con aristas hacia él
+        self.__sources__ = OOBTree()
+        self.__catalog__ = TextIndex()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if getattr(value, 'id', None) is not None:
+            self._child_ids()[str(value.id)] = key
+
+    def __delitem__(self, key):
+        child = self.data.get(key)
+        super().__delitem__(key)
+        if getattr(child, 'id', None) is not None:
+            self._child_ids().pop(str(child.id), None)
+
+    def clear(self):
+        super().clear()
+        self.__children__ = OOBTree()
+
+    def _child_ids(self):
+        "Index of the children (the honeycombs) by id, built on first use in beehives stored before it existed"
+        ids = getattr(self, '__children__', None)
+        if ids is None:
+            ids = self.__children__ = OOBTree(
+                {str(child.id): name for name, child in self.items() if getattr(child, 'id', None) is not None})
+        return ids
 
     # gestión de nodos y aristas
     def add_node(self, node):
         node_id = str(getattr(node, "id", "")) or getattr(node, "__name__", None)
         #node.__parent__ = self
         self.__nodes__[node_id] = node
+        self.reindex_node(node)
+
+    def reindex_node(self, node):
+        """Updates the full-text index after a node's title or contents changed, and records the change in the
+        change feed. The nodes of a graph are indexed along with it."""
+        record_change(self, 'node', UPSERT, str(getattr(node, "id", "")) or node.__name__, honeycomb_name(node))
+        catalog = getattr(self, '__catalog__', None)
+        if catalog is not None:
+            catalog.index_node(node)
+            for child in getattr(node, 'nodes', ()):
+                catalog.index_node(child)
 
     def get_node_by_name(self, name):
         """Obtiene el nodo por su nombre único (__name__)."""
         return self.__nodes__.get(name)
 
     def remove_node(self, node_id):
-        if node_id in self.__nodes__:
+        """Removes a node, its outgoing edges and every edge pointing at it. Only the adjacency entries of its
+        neighbours are touched."""
+        node = self.__nodes__.get(node_id)
+        honeycomb = self._honeycomb_of(node_id)
+        if node is not None:
+            record_change(self, 'node', DELETE, node_id, honeycomb)
+            explorer = find_explorer(node)
+            if explorer is not None:
+                explorer.mark_dirty(node, removed=True)
+            container = getattr(node, '__parent__', None)
+            if container is not None and getattr(node, '__name__', None):
+                update_walls(container, node.__name__)
+            if getattr(self, '__catalog__', None) is not None:
+                self.__catalog__.unindex(node_id)
             del self.__nodes__[node_id]
+        sources = getattr(self, '__sources__', None)
         if node_id in self.__edges__:
+            for edge in self.__edges__[node_id]:
+                if sources is not None:
+                    self._forget_source(edge_target(edge), node_id)
+                record_change(self, 'edge', DELETE, edge_key(edge), honeycomb, node_id)
             del self.__edges__[node_id]
+        if sources is None:
+            # Bases de datos sin índice inverso: se recorren todas las listas
+            incoming = [src for src, edges in self.__edges__.items() if any(edge_target(e) == node_id for e in edges)]
+        else:
+            incoming = list(sources.pop(node_id, ()))
+        for source_id in incoming:
+            self._drop_edges_to(source_id, node_id)
+
+    def _honeycomb_of(self, node_id):
+        "Name of the honeycomb of an indexed node, or of the honeycomb with that id"
+        node = self.__nodes__.get(node_id)
+        if node is not None:
+            return honeycomb_name(node)
+        return self._child_ids().get(node_id)
+
+    def _forget_source(self, target_id, source_id):
+        sources = self.__sources__.get(target_id)
+        if sources is None:
+            return
+        sources.discard(source_id)
+        if not sources:
+            del self.__sources__[target_id]
+
+    def _edge_set(self, source_id, create=False):
+        edges = self.__edges__.get(source_id)
+        if edges is None:
+            if create:
+                edges = self.__edges__[source_id] = EdgeSet()
+        elif not isinstance(edges, EdgeSet):
+            # Listas guardadas antes de existir EdgeSet
+            edges = self.__edges__[source_id] = EdgeSet(edges)
+        return edges
+
+    def _drop_edges(self, source_id, drop):
+        # Los EdgeSet vacíos se conservan: borrarlos chocaría con inserciones concurrentes
+        edges = self._edge_set(source_id)
+        if edges is None:
+            return
+        dropped = [edge_key(edge) for edge in edges if drop(edge)]
+        honeycomb = self._honeycomb_of(source_id) if dropped else None
+        for key in dropped:
+            edges.discard(key)
+            record_change(self, 'edge', DELETE, key, honeycomb, source_id)
+
+    def _drop_edges_to(self, source_id, target_id):
+        self._drop_edges(source_id, lambda edge: edge_target(edge) == target_id)
 
     def add_edge(self, source_id, edge):
-        if source_id not in self.__edges__:
-            self.__edges__[source_id] = PersistentList()
+        edges = self._edge_set(source_id, create=True)
         # Solo asigna __parent__ si el edge es un objeto con ese atributo
         if hasattr(edge, "__parent__"):
             edge.__parent__ = self
-        self.__edges__[source_id].append(edge)
+        edges.add(edge)
+        record_change(self, 'edge', UPSERT, edge_key(edge), self._honeycomb_of(source_id), source_id)
+        target_id = edge_target(edge)
+        if target_id is not None and getattr(self, '__sources__', None) is not None:
+            if target_id not in self.__sources__:
+                self.__sources__[target_id] = OOTreeSet()
+            self.__sources__[target_id].add(source_id)
+
+    def remove_edge(self, source_id, edge_id):
+        "Removes a single edge by id, keeping the reverse index up to date"
+        edges = self._edge_set(source_id)
+        edge = edges.get(edge_id) if edges is not None else None
+        if edge is None:
+            return
+        edges.discard(edge_id)
+        record_change(self, 'edge', DELETE, edge_id, self._honeycomb_of(source_id), source_id)
+        target_id = edge_target(edge)
+        if getattr(self, '__sources__', None) is not None and not any(edge_target(e) == target_id for e in edges):
+            self._forget_source(target_id, source_id)
+
+    def check_integrity(self, repair=False):
+        """Looks for dangling edges (pointing at or leaving removed nodes) and for a missing or stale reverse
+        index. Returns a list of problem descriptions; with ``repair`` the problems are fixed in place."""
+        problems = []
+        expected = {}
+        # Los honeycombs también son origen de aristas aunque no estén en __nodes__
+        known = {str(hc.id) for hc in self.values()}
+        known.update(self.__nodes__.keys())
+        for source_id, edges in list(self.__edges__.items()):
+            if source_id not in known:
+                problems.append(f"edges from missing node {source_id}")
+                if repair:
+                    del self.__edges__[source_id]
+                continue
+            for edge in edges:
+                target_id = edge_target(edge)
+                if target_id not in known:
+                    problems.append(f"edge {source_id} -> {target_id} points at a missing node")
+                expected.setdefault(target_id, set()).add(source_id)
+            if repair:
+                self._drop_dangling(source_id, known)
+
+        sources = getattr(self, '__sources__', None)
+        if sources is None:
+            problems.append("missing reverse edge index")
+        else:
+            stale = {target_id: set(ids) for target_id, ids in sources.items()}
+            if stale != expected:
+                problems.append("reverse edge index is out of date")
+        if repair and problems:
+            self.rebuild_sources()
+        return problems
+
+    def rebuild_sources(self):
+        "Recomputes the target -> sources reverse index from ``__edges__``"
+        sources = OOBTree()
+        for source_id, edges in self.__edges__.items():
+            for edge in edges:
+                target_id = edge_target(edge)
+                if target_id is None:
+                    continue
+                if target_id not in sources:
+                    sources[target_id] = OOTreeSet()
+                sources[target_id].add(source_id)
+        self.__sources__ = sources
+
+    def _drop_dangling(self, source_id, known):
+        self._drop_edges(source_id, lambda edge: edge_target(edge) not in known)
 
     def set_name(self, name, title=""):
         self.__name__ = name
@@ -76,17 +271,34 @@ class BeeHive(PersistentMapping):
             ]
         }
 
-class Honeycomb(PersistentMapping):
+class Honeycomb(Folder):
     """A collection of interactive and non-interactive cells. It must have an associated map (either static or dynamic) which will be displayed when the honeycomb is opened."""
 
     def __init__(self, name, title=""):
-        PersistentMapping.__init__(self)
+        super().__init__()
         self.id = str(uuid.uuid4())
         self.__name__ = name
         self.title = title
         self.icon = None
         self.map = None
 
+    def __setitem__(self, key, value):
+        previous = self.data.get(key)
+        super().__setitem__(key, value)
+        explorer = getattr(self, '__explorer__', None)
+        if explorer is not None:
+            if previous is not None and previous is not value and getattr(previous, '__axes__', None):
+                explorer.mark_dirty(previous, removed=True)
+            if getattr(value, '__axes__', None):
+                explorer.mark_dirty(value)
+
+    def __delitem__(self, key):
+        cell = self.data.get(key)
+        super().__delitem__(key)
+        explorer = getattr(self, '__explorer__', None)
+        if explorer is not None and getattr(cell, '__axes__', None):
+            explorer.mark_dirty(cell, removed=True)
+
     def set_map(self, honeycombmap):
         self.map = honeycombmap
 
@@ -94,21 +306,78 @@ class Honeycomb(PersistentMapping):
         return self.map
 
 class CellEdge(Persistent):
-    def __init__(self, name, title, from_node, to_node, kind="default"):
+    # Aristas guardadas sin id: se identifican por su nombre hasta migrarlas
+    id = None
+
+    def __init__(self, name, title, from_node, to_node, kind="default", id=None):
+        self.id = id or name
         self.name = name
         self.title = title
         self.from_node = from_node
         self.to_node = to_node
         self.kind = kind
 
-class HoneycombGraph(PersistentMapping):
+def _layout_committed(success, graph):
+    "After commit hook of ``HoneycombGraph.mark_layout_dirty``"
+    if not success or graph._p_oid is None:
+        return
+    for listener in list(layout_listeners):
+        try:
+            listener(graph)
+        except Exception:
+            log.exception("Layout listener %r failed", listener)
+
+
+class HoneycombGraph(Folder):
+    # Grafos guardados antes de calcular las posiciones en el servidor
+    layout_dirty = True
+
     def __init__(self, name="", title="", *args, **kwargs):
         super().__init__()
         self.id = uuid.uuid4()
         self.__name__ = name
         self.title = title
-        self.nodes = PersistentList()
-        self.edges = PersistentList()
+        # Listas en BTree: agregar nodos no vuelve a guardar la lista completa
+        self.nodes = BTreeList()
+        self.edges = BTreeList()
+        self._init_indexes()
+
+    def _init_indexes(self):
+        # Índices persistentes: nombre -> nodo, id -> nodo y adyacencia por id de nodo
+        self.__by_name__ = OOBTree()
+        self.__by_id__ = OOBTree()
+        self.__out__ = OOBTree()
+        self.__in__ = OOBTree()
+
+    def _has_indexes(self):
+        return getattr(self, '__by_id__', None) is not None
+
+    @staticmethod
+    def _edge_key(edge):
+        return getattr(edge, 'id', None) or edge.name
+
+    def _index_node(self, node):
+        node_name = getattr(node, '__name__', None)
+        if node_name:
+            self.__by_name__[node_name] = node
+        self.__by_id__[str(node.id)] = node
+
+    def _index_edge(self, edge):
+        key = self._edge_key(edge)
+        for index, endpoint in ((self.__out__, edge.from_node), (self.__in__, edge.to_node)):
+            node_id = str(endpoint.id)
+            if node_id not in index:
+                index[node_id] = OOBTree()
+            index[node_id][key] = edge
+
+    def reindex(self):
+        """Rebuilds the name, id and adjacency indexes from ``nodes`` and ``edges``. Used to migrate graphs stored
+        before the indexes existed."""
+        self._init_indexes()
+        for node in self.nodes:
+            self._index_node(node)
+        for edge in self.edges:
+            self._index_edge(edge)
 
     def add_node(self, node):
         self.nodes.append(node)
@@ -118,18 +387,122 @@ class HoneycombGraph(PersistentMapping):
             self[node_name] = node
         else:
             self[str(node.id)] = node
+        if self._has_indexes():
+            self._index_node(node)
+        record_change(self, 'node', UPSERT, str(node.id), honeycomb_name(self))
+        self.mark_layout_dirty()
         self._p_changed = True
 
     def add_edge(self, edge):
         self.edges.append(edge)
+        if self._has_indexes():
+            self._index_edge(edge)
+        record_change(self, 'edge', UPSERT, self._edge_key(edge), honeycomb_name(self), str(edge.from_node.id))
+        self.mark_layout_dirty()
         self._p_changed = True
 
+    def mark_layout_dirty(self):
+        "Flags the graph for a new layout, which the ``layout_listeners`` are asked for once the transaction commits"
+        self.layout_dirty = True
+        txn = current_transaction(self)
+        try:
+            txn.data(self)
+        except KeyError:
+            txn.set_data(self, True)
+            txn.addAfterCommitHook(_layout_committed, (self,))
+
+    def defer_layout(self):
+        """Keeps the current transaction from asking for a layout when it commits, for the batches of an import:
+        a layout job would conflict with the next batch."""
+        current_transaction(self).set_data(self, False)
+
+    def apply_layout(self):
+        """Places the nodes with ``stress_layout`` over the graph distances and stores their coordinates in their
+        ``position``. Nodes whose position didn't change aren't written. Run by the background worker after the
+        graph is imported or edited. Graphs of more than ``MAX_NODES`` nodes, such as large imports, are placed
+        with the cheaper ``pivot_layout``."""
+        nodes = list(self.nodes)
+        layout = stress_layout if len(nodes) <= MAX_NODES else pivot_layout
+        index = {str(node.id): i for i, node in enumerate(nodes)}
+        pairs = [(index[str(edge.from_node.id)], index[str(edge.to_node.id)]) for edge in self.edges
+                 if str(edge.from_node.id) in index and str(edge.to_node.id) in index]
+        for node, (x, y) in zip(nodes, layout(len(nodes), pairs)):
+            position = {'x': round(float(x), 1), 'y': round(float(y), 1)}
+            if getattr(node, 'position', None) != position:
+                node.position = position
+        self.layout_dirty = False
+
     def get_node_by_name(self, name):
+        if self._has_indexes():
+            return self.__by_name__.get(name)
         for node in self.nodes:
             if getattr(node, '__name__', None) == name:
                 return node
         return None
 
+    def get_node_by_id(self, node_id):
+        node_id = str(node_id)
+        if self._has_indexes():
+            return self.__by_id__.get(node_id)
+        for node in self.nodes:
+            if str(node.id) == node_id:
+                return node
+        return None
+
+    def out_edges(self, node_id):
+        """Edges leaving the given node, in O(degree) when the graph is indexed."""
+        node_id = str(node_id)
+        if self._has_indexes():
+            return list(self.__out__.get(node_id, {}).values())
+        return [edge for edge in self.edges if str(edge.from_node.id) == node_id]
+
+    def in_edges(self, node_id):
+        """Edges arriving to the given node, in O(degree) when the graph is indexed."""
+        node_id = str(node_id)
+        if self._has_indexes():
+            return list(self.__in__.get(node_id, {}).values())
+        return [edge for edge in self.edges if str(edge.to_node.id) == node_id]
+
+    def neighbours(self, node_id):
+        """Nodes connected to the given node by an edge in either direction."""
+        found = {}
+        for edge in self.out_edges(node_id):
+            found[str(edge.to_node.id)] = edge.to_node
+        for edge in self.in_edges(node_id):
+            found[str(edge.from_node.id)] = edge.from_node
+        return list(found.values())
+
+    @staticmethod
+    def node_from_json(node_data):
+        "Builds the node of a graph described by an item of the ``nodes`` list of the graph JSON"
+        node_type = node_data.get("type", None)
+        assert node_type in ['custom', None]
+        if node_type == "custom":
+            node_obj = CellNode(
+                name=node_data['data']['label'].lower().replace(" ", "-"),
+                title = node_data['data']['label'],
+            )
+        elif node_type == None:
+            node_obj = CellText( #ToDo: Graphs can have different kinds of node, this should also be codified in the JSON
+                title=node_data['data']['label'],
+                name=node_data['data']['label'].lower().replace(" ", "-"), #ToDo: Nodes should have a name, if it is not provided, it could be a scrub from the title or label. Use id as name only if there is no other option.
+                contents=node_data['data']['label']
+            )
+        node_obj.id = node_data['id']
+        return node_obj
+
+    @staticmethod
+    def edge_from_json(edge_data, from_node, to_node):
+        "Builds the edge described by an item of the ``edges`` list of the graph JSON between two nodes"
+        return CellEdge(
+            id=edge_data.get('id'),
+            name=f"edge-{uuid.uuid4()}",
+            title=edge_data.get('label', ''),
+            from_node=from_node,
+            to_node=to_node,
+            kind="default"
+        )
+
     @classmethod
     def from_json(cls, json_data, name="graph", title="Honeycomb Graph"):
         graph_data = json.loads(json_data)
@@ -140,44 +513,20 @@ class HoneycombGraph(PersistentMapping):
 
         # 1. Crear todos los objetos de nodo
         for node_data in graph_data['nodes']:
-            json_id = node_data['id']
-            node_type = node_data.get("type", None)
-            assert node_type in ['custom', None]
-            if node_type == "custom":
-                node_obj = CellNode(
-                    name=node_data['data']['label'].lower().replace(" ", "-"),
-                    title = node_data['data']['label'],
-                )
-            elif node_type == None:
-                node_obj = CellText( #ToDo: Graphs can have different kinds of node, this should also be codified in the JSON
-                    title=node_data['data']['label'],
-                    name=node_data['data']['label'].lower().replace(" ", "-"), #ToDo: Nodes should have a name, if it is not provided, it could be a scrub from the title or label. Use id as name only if there is no other option.
-                    contents=node_data['data']['label']
-                )
-            node_obj.id = json_id
+            node_obj = cls.node_from_json(node_data)
             node_obj.__parent__ = graph
 
             # Añadir al grafo principal y al mapa temporal
             graph.add_node(node_obj)
-            nodes_map[json_id] = node_obj
+            nodes_map[node_data['id']] = node_obj
 
         # 2. Crear todos los objetos de arista (edge)
         for edge_data in graph_data['edges']:
-            source_id = edge_data['source']
-            target_id = edge_data['target']
-            
-            from_node = nodes_map.get(source_id)
-            to_node = nodes_map.get(target_id)
-            
+            from_node = nodes_map.get(edge_data['source'])
+            to_node = nodes_map.get(edge_data['target'])
+
             if from_node and to_node:
-                edge_obj = CellEdge(
-                    name=f"edge-{uuid.uuid4()}",
-                    title=edge_data.get('label', ''),
-                    from_node=from_node,
-                    to_node=to_node,
-                    kind="default"
-                )
-                graph.add_edge(edge_obj)
+                graph.add_edge(cls.edge_from_json(edge_data, from_node, to_node))
 
         print(f"DEBUG - Grafo '{graph.title}' generado con {len(graph.nodes)} nodos y {len(graph.edges)} aristas.")
 
@@ -226,7 +575,7 @@ class CellLeaf(Persistent):
         self.id = uuid.uuid4()
 
 
-class CellNode(PersistentMapping):
+class CellNode(Folder):
     """A node in the honeycomb structure, it can contain children nodes or be alone, it can also be static or interactive."""
     def __init__(self, name="", parent=None, title=""):
         super().__init__()
@@ -0,0 +1,143 @@
+"""Full-text index over the titles and contents of the BeeHive cells."""
+
+import heapq
+import math
+import re
+import unicodedata
+
+from persistent import Persistent
+from BTrees._OOBTree import OOBTree, OOTreeSet
+from BTrees._OIBTree import OIBTree
+from BTrees.Length import Length
+
+
+STOPWORDS = frozenset("""
+    a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el ella ellas ellos
+    en entre era es esa esas ese eso esos esta estas este esto estos fue ha hay la las le les lo los mas me mi muy
+    ni no nos o otra otras otro otros para pero poco por porque que quien quienes se sea ser si sin sobre son su sus
+    tambien te tiene todo todos tu un una uno unos y ya yo
+""".split())
+
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_word = re.compile(r"\w+")
+_tag = re.compile(r"<[^>]+>")
+
+
+def normalize(text):
+    "Lowercases the text and strips accents, so 'Zángano' and 'zangano' match"
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return [word for word in _word.findall(normalize(text)) if len(word) > 1 and word not in STOPWORDS]
+
+
+def searchable_text(node):
+    "Collects the indexable text of a cell: CellText contents and CellRichText source, without markup"
+    parts = []
+    for attr in ('contents', 'source'):
+        value = getattr(node, attr, None)
+        if isinstance(value, str):
+            parts.append(_tag.sub(' ', value))
+    return ' '.join(parts)
+
+
+class TextIndex(Persistent):
+    """Inverted index: each term maps to the ids of the nodes containing it and its frequency there. Results are
+    ranked with BM25, title terms counting ``TITLE_WEIGHT`` times. Normalized titles are kept in their own BTree so
+    prefix suggestions are a key range scan."""
+
+    def __init__(self):
+        self._postings = OOBTree()  # término -> OIBTree(id de nodo -> frecuencia)
+        self._lengths = OIBTree()  # id de nodo -> número de términos
+        self._terms = OOBTree()  # id de nodo -> términos indexados, para desindexar
+        self._titles = OOBTree()  # título normalizado -> ids de nodo
+        self._node_titles = OOBTree()  # id de nodo -> título normalizado
+        self._objects = OOBTree()  # id de nodo -> nodo, también para nodos fuera de BeeHive.__nodes__
+        self._total_length = Length()
+        self._documents = Length()
+
+    def __len__(self):
+        return self._documents()
+
+    def get(self, node_id, default=None):
+        return self._objects.get(node_id, default)
+
+    def index_node(self, node):
+        node_id = str(node.id)
+        self.index(node_id, getattr(node, 'title', '') or '', searchable_text(node))
+        self._objects[node_id] = node
+
+    def index(self, node_id, title, text):
+        self.unindex(node_id)
+        frequencies = {}
+        for term in tokenize(title):
+            frequencies[term] = frequencies.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(text):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = OIBTree()
+            postings[node_id] = frequency
+        length = sum(frequencies.values())
+        self._lengths[node_id] = length
+        self._terms[node_id] = tuple(frequencies)
+        self._total_length.change(length)
+        self._documents.change(1)
+
+        key = normalize(title).strip()
+        if key:
+            if key not in self._titles:
+                self._titles[key] = OOTreeSet()
+            self._titles[key].add(node_id)
+            self._node_titles[node_id] = key
+
+    def unindex(self, node_id):
+        # Los árboles que quedan vacíos se conservan para no chocar con inserciones concurrentes
+        if node_id not in self._lengths:
+            return
+        for term in self._terms.pop(node_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None and node_id in postings:
+                del postings[node_id]
+        self._total_length.change(-self._lengths.pop(node_id))
+        self._documents.change(-1)
+        self._objects.pop(node_id, None)
+        key = self._node_titles.pop(node_id, None)
+        if key is not None and key in self._titles:
+            self._titles[key].discard(node_id)
+
+    def search(self, query, start=0, size=20):
+        "Returns the total number of matches and the (node id, score) pairs of the requested page, best first"
+        documents = self._documents()
+        if not documents:
+            return 0, []
+        average = max(self._total_length() / documents, 1)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for node_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[node_id] / average)
+                scores[node_id] = scores.get(node_id, 0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        best = heapq.nlargest(start + size, scores.items(), key=lambda item: (item[1], item[0]))
+        return len(scores), best[start:]
+
+    def suggest(self, prefix, limit=10):
+        "Returns the ids of nodes whose normalized title starts with the prefix, in title order"
+        prefix = normalize(prefix).strip()
+        if not prefix:
+            return []
+        found = []
+        for node_ids in self._titles.values(min=prefix, max=prefix + '\uffff'):
+            found.extend(node_ids)
+            if len(found) >= limit:
+                break
+        return found[:limit]
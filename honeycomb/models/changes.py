@@ -0,0 +1,135 @@
+"""Change feed of the BeeHive graph. Node and edge changes are recorded in the metadata (extension) of the
+transaction that makes them, so concurrent writers never share a log object, and read back by iterating the
+storage's transactions after a given tid. Functions in ``listeners`` are also called after each commit which
+recorded changes, to push them to live clients.
+
+FileStorage keeps at most 64KB of metadata per transaction, so a transaction changing more than ``MAX_CHANGES``
+objects records a single ``resync`` change per honeycomb instead: clients reload the honeycomb."""
+
+import logging
+import uuid
+
+import transaction
+from ZODB.utils import p64, u64
+
+
+EXTENSION_KEY = 'honeycomb.changes'
+# Marca de la transacción, para encontrar su tid después del commit
+TOKEN_KEY = 'honeycomb.token'
+UPSERT = 'upsert'
+DELETE = 'delete'
+RESYNC = 'resync'
+MAX_CHANGES = 200
+
+log = logging.getLogger(__name__)
+
+# Funciones llamadas con (tid, cambios) después de cada commit que registró cambios
+listeners = []
+
+
+def current_transaction(obj):
+    "The transaction an object is being changed in: the one of its connection, or the thread's current one"
+    jar = getattr(obj, '_p_jar', None)
+    manager = getattr(jar, 'transaction_manager', None) or transaction.manager
+    return manager.get()
+
+
+def record_change(obj, kind, op, object_id, honeycomb=None, source=None):
+    """Adds a change of a node or edge to the metadata of the transaction changing ``obj``. Only the last change
+    of each object in a transaction is kept."""
+    change = {'type': kind, 'op': op, 'id': object_id, 'honeycomb': honeycomb}
+    if source is not None:
+        change['source'] = source
+    txn = current_transaction(obj)
+    changes = txn.extension.get(EXTENSION_KEY)
+    if changes is None:
+        changes = txn.extension[EXTENSION_KEY] = {}
+        token = txn.extension[TOKEN_KEY] = uuid.uuid4().hex
+        start = {}
+        txn.addBeforeCommitHook(_before_commit, (obj, start))
+        txn.addAfterCommitHook(_notify, (obj, changes, token, start))
+    if f'honeycomb:{honeycomb}' in changes:
+        return
+    # Se reinserta para conservar el orden del último cambio
+    changes.pop(f'{kind}:{object_id}', None)
+    changes[f'{kind}:{object_id}'] = change
+    if len(changes) > MAX_CHANGES:
+        _collapse(changes)
+
+
+def _collapse(changes):
+    "Replaces the changes recorded so far with one ``resync`` change per honeycomb they belong to"
+    honeycombs = dict.fromkeys(change['honeycomb'] for change in changes.values())
+    changes.clear()
+    for honeycomb in honeycombs:
+        changes[f'honeycomb:{honeycomb}'] = {'type': 'honeycomb', 'op': RESYNC, 'id': honeycomb, 'honeycomb': honeycomb}
+
+
+def _before_commit(obj, start):
+    "Keeps the last tid of the database before the commit, which the tid of the transaction has to follow"
+    jar = getattr(obj, '_p_jar', None)
+    if jar is not None:
+        start['tid'] = jar.db().lastTransaction()
+
+
+def _notify(success, obj, changes, token, start):
+    "After commit hook, calls the listeners with the tid of the committed transaction"
+    if not success or not listeners:
+        return
+    jar = getattr(obj, '_p_jar', None)
+    tid = committed_tid(jar.db(), start.get('tid'), token) if jar is not None else None
+    for listener in list(listeners):
+        try:
+            listener(tid, list(changes.values()))
+        except Exception:
+            log.exception("Change listener %r failed", listener)
+
+
+def committed_tid(db, start, token):
+    """The tid of the transaction marked with ``token``, looked up among the ones after ``start``: the last tid of
+    the database may already be the one of a later commit. Storages which can't be iterated give the last one."""
+    if start is not None and hasattr(db.storage, 'iterator'):
+        iterator = db.storage.iterator(p64(u64(start) + 1))
+        try:
+            for record in iterator:
+                if getattr(record, 'extension', {}).get(TOKEN_KEY) == token:
+                    return record.tid
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+    return db.lastTransaction()
+
+
+def format_tid(tid):
+    return tid.hex()
+
+
+def parse_tid(value):
+    "The 8 byte tid of its hexadecimal form; raises ValueError for anything else"
+    tid = bytes.fromhex(value)
+    if len(tid) != 8:
+        raise ValueError(f"Invalid transaction id {value!r}")
+    return tid
+
+
+def changes_since(db, since, limit=1000, honeycomb=None):
+    """The changes committed after the ``since`` tid, oldest first, each with the tid of its transaction, and the
+    tid to ask from next time. Whole transactions are returned, so a page may exceed ``limit`` by the size of its
+    last transaction."""
+    changes, cursor = [], since
+    iterator = db.storage.iterator(p64(u64(since) + 1))
+    try:
+        for record in iterator:
+            found = getattr(record, 'extension', {}).get(EXTENSION_KEY, {})
+            tid = format_tid(record.tid)
+            changes.extend(dict(change, tid=tid) for change in found.values()
+                           if honeycomb is None or change.get('honeycomb') == honeycomb)
+            cursor = record.tid
+            if len(changes) >= limit:
+                break
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+    return changes, cursor
@@ -0,0 +1,93 @@
+"""Edge storage for the BeeHive adjacency lists."""
+
+import uuid
+
+from persistent import Persistent
+from BTrees._OOBTree import OOBTree
+from BTrees.Length import Length
+from ZODB.ConflictResolution import PersistentReference
+
+
+def edge_key(edge):
+    "Returns the id of an edge, assigning a new one to plain dict edges which lack it"
+    if isinstance(edge, dict):
+        if not edge.get("id"):
+            edge["id"] = str(uuid.uuid4())
+        return edge["id"]
+    return getattr(edge, "id", None) or edge.name
+
+
+class StoredEdge:
+    """An edge as kept in the buckets of an EdgeSet. BTrees merge concurrent changes to a bucket comparing its values
+    with ``<`` and ``==``, which dicts and persistent references don't support: through this wrapper they are equal
+    when ``same_edge`` and never lower, so the merge only tells whether an edge changed."""
+    __slots__ = ('edge',)
+
+    def __init__(self, edge):
+        self.edge = edge
+
+    def __reduce__(self):
+        return StoredEdge, (self.edge,)
+
+    def __eq__(self, other):
+        return isinstance(other, StoredEdge) and same_edge(self.edge, other.edge)
+
+    def __lt__(self, other):
+        return False
+
+    __hash__ = None
+
+
+class EdgeSet(Persistent):
+    """The edges leaving one node, keyed by edge id in an OOBTree. Adding or removing an edge only rewrites the
+    bucket holding it, and the buckets merge concurrent transactions changing different edges of the same node
+    instead of raising ``ConflictError``, so they don't need to be retried."""
+
+    def __init__(self, edges=()):
+        self._edges = OOBTree()
+        self._count = Length()
+        # Cambia con cada escritura, aunque sólo se reescriba una cubeta del árbol
+        self._changes = Length()
+        for edge in edges:
+            self.add(edge)
+
+    def add(self, edge):
+        key = edge_key(edge)
+        if self._edges.insert(key, StoredEdge(edge)):
+            self._count.change(1)
+        else:
+            self._edges[key] = StoredEdge(edge)
+        self._changes.change(1)
+
+    def discard(self, key):
+        if key in self._edges:
+            del self._edges[key]
+            self._count.change(-1)
+            self._changes.change(1)
+
+    def tag_objects(self):
+        """The persistent objects whose serials tell the state of the set, for ``state_tag``: the set itself never
+        changes after it's created, while the counter of changes is written by every add and discard."""
+        return [self, self._changes]
+
+    def get(self, key, default=None):
+        edge = self._edges.get(key)
+        return edge.edge if edge is not None else default
+
+    def __contains__(self, key):
+        return key in self._edges
+
+    def __iter__(self):
+        return iter([edge.edge for edge in self._edges.values()])
+
+    def __len__(self):
+        return self._count()
+
+
+def same_edge(a, b):
+    """Compares two edges of the bucket states merged by conflict resolution. Persistent edges come as
+    ``PersistentReference``, which raises ValueError when compared with another object: they're compared by oid."""
+    if isinstance(a, PersistentReference) or isinstance(b, PersistentReference):
+        return (isinstance(a, PersistentReference) and isinstance(b, PersistentReference)
+                and a.oid == b.oid)
+    return a == b
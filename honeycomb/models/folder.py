@@ -0,0 +1,185 @@
+"""BTree-backed persistent containers used as base class for the traversable resources of the BeeHive."""
+
+from persistent import Persistent
+from BTrees._OOBTree import OOBTree
+from BTrees._LOBTree import LOBTree
+from BTrees.Length import Length
+
+from .axes import WallIndex, update_walls
+from ..urls import invalidate_paths
+
+
+_marker = object()
+
+
+class Folder(Persistent):
+    """A persistent mapping whose children live in an OOBTree instead of a single dict. Children are loaded by
+    buckets on demand, inserts only rewrite the bucket they land in and the child count is kept in a conflict-free
+    ``Length``. It keeps the ``PersistentMapping`` API, though keys are iterated in sorted order."""
+
+    def __init__(self, data=None, **kwargs):
+        super().__init__()
+        self.data = OOBTree()
+        self._count = Length()
+        if data is not None:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    def __setstate__(self, state):
+        # Objetos guardados como PersistentMapping: su estado trae un dict en 'data' (o '_container')
+        data = state.get('data', state.get('_container'))
+        if isinstance(data, dict):
+            state = {k: v for k, v in state.items() if k != '_container'}
+            state['data'] = OOBTree(data)
+            state['_count'] = Length(len(data))
+        super().__setstate__(state)
+
+    def _touch(self):
+        # Un árbol recién migrado aún no tiene jar: sólo se guarda si se guarda el contenedor
+        if self.data._p_jar is None and self._p_jar is not None:
+            self._p_changed = True
+
+    def migrate(self):
+        "Stores a container loaded from a legacy PersistentMapping pickle in its BTree form"
+        legacy = self.data._p_jar is None and self._p_jar is not None
+        self._touch()
+        return legacy
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self._touch()
+        if self.data.insert(key, value):
+            self._count.change(1)
+        else:
+            self.data[key] = value
+        update_walls(self, key, value)
+        invalidate_paths()
+
+    def __delitem__(self, key):
+        self._touch()
+        del self.data[key]
+        self._count.change(-1)
+        update_walls(self, key)
+        invalidate_paths()
+
+    def rename(self, oldname, newname):
+        "Stores the child ``oldname`` under ``newname``, which becomes its ``__name__``"
+        if newname in self.data:
+            raise KeyError(newname)
+        child = self.data[oldname]
+        del self[oldname]
+        child.__name__ = newname
+        self[newname] = child
+        return child
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return self._count()
+
+    def has_key(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def keys(self, min=None, max=None, excludemin=False, excludemax=False):
+        return self.data.keys(min, max, excludemin, excludemax)
+
+    def values(self, min=None, max=None, excludemin=False, excludemax=False):
+        return self.data.values(min, max, excludemin, excludemax)
+
+    def items(self, min=None, max=None, excludemin=False, excludemax=False):
+        return self.data.items(min, max, excludemin, excludemax)
+
+    def pop(self, key, default=_marker):
+        if key in self.data:
+            value = self.data[key]
+            del self[key]
+            return value
+        if default is _marker:
+            raise KeyError(key)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self.data:
+            self[key] = default
+        return self.data[key]
+
+    def update(self, other=(), **kwargs):
+        items = other.items() if hasattr(other, 'items') else other
+        for key, value in items:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def clear(self):
+        self._touch()
+        self.data.clear()
+        self._count.set(0)
+        if getattr(self, '__walls__', None) is not None:
+            self.__walls__ = WallIndex(self.__walls__.axes)
+        invalidate_paths()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {getattr(self, '__name__', None)!r} with {len(self)} children>"
+
+
+class BTreeList(Persistent):
+    """An append-only persistent sequence stored in an LOBTree keyed by position, for lists which grow large, such
+    as the nodes and edges of an imported graph. Appending only rewrites the last bucket, where a PersistentList is
+    pickled whole at every savepoint and commit. It keeps the list API used by the graphs: append, remove,
+    iteration, ``len`` and indexing."""
+
+    def __init__(self, items=()):
+        super().__init__()
+        self.data = LOBTree()
+        self._count = Length()
+        for item in items:
+            self.append(item)
+
+    def append(self, item):
+        key = self.data.maxKey() + 1 if self.data else 0
+        self.data[key] = item
+        self._count.change(1)
+
+    def remove(self, item):
+        for key, value in self.data.items():
+            if value == item:
+                del self.data[key]
+                self._count.change(-1)
+                return
+        raise ValueError(f"{item!r} is not in the list")
+
+    def __iter__(self):
+        return iter(self.data.values())
+
+    def __len__(self):
+        return self._count()
+
+    def __bool__(self):
+        return bool(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        # Sin eliminaciones las llaves son las posiciones
+        if len(self) == self.data.maxKey() + 1:
+            return self.data[index]
+        for position, value in enumerate(self.data.values()):
+            if position == index:
+                return value
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} with {len(self)} items>"
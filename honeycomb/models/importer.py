@@ -0,0 +1,197 @@
+"""Incremental import of graph JSON files too large to load at once. The file is parsed as a stream, one node or
+edge at a time, and the graph is committed in batches so neither the parsed document nor the transaction grow with
+the size of the graph."""
+
+import json
+import tempfile
+import time
+
+from .beehive import HoneycombGraph
+
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStream:
+    "Reads JSON values one at a time from a text stream, keeping only the unread part of the last chunks in memory"
+
+    def __init__(self, stream, chunk_size=65536):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        "The next character which isn't whitespace, without consuming it"
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                raise ValueError("Unexpected end of the JSON document")
+
+    def expect(self, chars):
+        "Consumes the next character, which has to be one of ``chars``"
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in the JSON document, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        "Decodes the next complete value, reading chunks until it fits in the buffer"
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # Un número al final del buffer puede seguir en el próximo bloque
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+
+
+def iter_graph(stream, chunk_size=65536):
+    """Yields ``('node', data)`` and ``('edge', data)`` for the items of the ``nodes`` and ``edges`` lists of a graph
+    JSON document, in the order they appear. Other keys of the document are skipped."""
+    reader = JSONStream(stream, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key in ('nodes', 'edges') and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield key[:-1], reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            reader.value()
+        if reader.expect(',}') == '}':
+            return
+
+
+class ImportStats:
+    "Counters of an import, for progress reports"
+
+    def __init__(self):
+        self.nodes = 0
+        self.edges = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+
+    @property
+    def items(self):
+        return self.nodes + self.edges + self.skipped
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        "Items processed per second"
+        elapsed = self.elapsed
+        return self.items / elapsed if elapsed > 0 else 0.0
+
+
+# Aristas en espera que se guardan en memoria antes de pasarlas a un archivo temporal
+PENDING_BYTES = 8 * 1024 * 1024
+
+
+def import_graph(root, parent, stream, name, title="", batch_size=2000, savepoint_size=500, progress=None):
+    """Imports a graph JSON stream as the ``name`` graph of the persistent ``parent`` container. Changes are
+    committed every ``batch_size`` items and flushed to a savepoint every ``savepoint_size`` items; after each
+    one the connection cache is garbage collected, so memory stays bounded by the batch. ``progress`` is called
+    with the ``ImportStats`` after each commit.
+
+    Nodes are looked up through the graph's id index instead of a map of the whole file, and edges found before
+    their nodes are held until the end in a temporary file, kept in memory up to ``PENDING_BYTES``. Nodes and edges
+    whose id is already in the graph are skipped, so an interrupted import can be run again to complete it. The
+    graph's layout is asked for by the last commit only."""
+    conn = parent._p_jar
+    tm = conn.transaction_manager
+    stats = ImportStats()
+    graph = parent.get(name)
+    if graph is None:
+        graph = HoneycombGraph(name, title)
+        graph.__parent__ = parent
+        parent[name] = graph
+        root.add_node(graph)
+    catalog = getattr(root, '__catalog__', None)
+    graph.defer_layout()
+
+    def add_edge(edge_data):
+        from_node = graph.get_node_by_id(edge_data['source'])
+        to_node = graph.get_node_by_id(edge_data['target'])
+        if from_node is None or to_node is None:
+            return False
+        edge_id = edge_data.get('id')
+        if edge_id is not None and edge_id in graph.__out__.get(str(from_node.id), {}):
+            stats.skipped += 1
+        else:
+            graph.add_edge(HoneycombGraph.edge_from_json(edge_data, from_node, to_node))
+            stats.edges += 1
+        return True
+
+    def checkpoint():
+        if stats.items % batch_size == 0:
+            tm.commit()
+            graph.defer_layout()
+            conn.cacheGC()
+            if progress is not None:
+                progress(stats)
+        elif stats.items % savepoint_size == 0:
+            tm.savepoint(True)
+            conn.cacheGC()
+
+    with tempfile.SpooledTemporaryFile(PENDING_BYTES, mode='w+', encoding='utf-8') as pending:
+        for kind, data in iter_graph(stream):
+            if kind == 'node':
+                if graph.get_node_by_id(data['id']) is not None:
+                    stats.skipped += 1
+                else:
+                    node = HoneycombGraph.node_from_json(data)
+                    node.__parent__ = graph
+                    graph.add_node(node)
+                    if catalog is not None:
+                        catalog.index_node(node)
+                    stats.nodes += 1
+            elif not add_edge(data):
+                pending.write(json.dumps(data) + '\n')
+                continue
+            checkpoint()
+
+        pending.seek(0)
+        for line in pending:
+            if not add_edge(json.loads(line)):
+                # Aristas hacia nodos que no están en el archivo, como en from_json
+                stats.skipped += 1
+            checkpoint()
+    tm.commit()
+    # El layout se pide una vez, al terminar
+    graph.mark_layout_dirty()
+    tm.commit()
+    conn.cacheGC()
+    if progress is not None:
+        progress(stats)
+    return graph, stats
@@ -0,0 +1,152 @@
+"""Server-side layout of the graphs: stress majorization over the graph distances, vectorized with NumPy, and
+pivot MDS for the graphs too large for it."""
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, shortest_path
+from scipy.spatial.distance import pdist, squareform
+
+
+# Separación en píxeles de dos nodos adyacentes
+EDGE_LENGTH = 220.0
+# Las matrices de distancias son densas, n x n flotantes por cada una, y pinv es O(n³): con 1000 nodos el layout
+# toma menos de 3 s de uno de los hilos del worker. Los grafos más grandes usan pivot_layout
+MAX_NODES = 1000
+# Nodos pivote de pivot_layout: una búsqueda en anchura y una columna de n flotantes por cada uno
+PIVOTS = 50
+
+
+def _adjacency(n, pairs):
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+    return coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n)).tocsr()
+
+
+def _fill_unreachable(distances):
+    finite = distances[np.isfinite(distances)]
+    distances[~np.isfinite(distances)] = (finite.max() if finite.size else 0) + 1
+    return distances
+
+
+def graph_distances(n, pairs):
+    """Shortest path lengths between the ``n`` nodes joined by the (i, j) index pairs, ignoring directions. Nodes in
+    different components are placed one step farther than the longest path."""
+    return _fill_unreachable(shortest_path(_adjacency(n, pairs), directed=False, unweighted=True))
+
+
+def classical_mds(distances, dims=2):
+    "Initial coordinates from the top eigenvectors of the double centered squared distances, with fixed signs"
+    n = len(distances)
+    centering = np.eye(n) - 1.0 / n
+    values, vectors = np.linalg.eigh(-0.5 * centering @ (distances ** 2) @ centering)
+    top = np.argsort(values)[::-1][:dims]
+    coords = vectors[:, top] * np.sqrt(np.maximum(values[top], 0))
+    # El signo de los vectores propios es arbitrario: se fija para que el resultado sea reproducible
+    return _fix_signs(coords)
+
+
+def _fix_signs(coords):
+    signs = np.sign(coords[np.argmax(np.abs(coords), axis=0), np.arange(coords.shape[1])])
+    return coords * np.where(signs == 0, 1, signs)
+
+
+def stress_layout(n, pairs, dims=2, iterations=200, tolerance=1e-4):
+    """Coordinates of ``n`` nodes which minimize the stress between their euclidean distances and their graph
+    distances, by majorization (SMACOF) from a classical MDS start. Each iteration is a few n x n array operations;
+    it stops when the stress improves less than ``tolerance`` relatively."""
+    if n == 0:
+        return np.empty((0, dims))
+    if n == 1:
+        return np.zeros((1, dims))
+    distances = graph_distances(n, pairs)
+    weights = np.zeros_like(distances)
+    np.divide(1.0, distances ** 2, out=weights, where=distances > 0)
+    laplacian = -weights
+    laplacian[np.diag_indices(n)] = weights.sum(axis=1)
+    inverse = np.linalg.pinv(laplacian)
+
+    coords = classical_mds(distances, dims)
+    coords += np.random.default_rng(0).normal(scale=1e-3, size=coords.shape)
+    stress = np.inf
+    for iteration in range(iterations):
+        current = squareform(pdist(coords))
+        new_stress = np.sum(np.triu(weights * (current - distances) ** 2, 1))
+        if stress - new_stress < tolerance * new_stress:
+            break
+        stress = new_stress
+        ratios = np.zeros_like(distances)
+        np.divide(weights * distances, current, out=ratios, where=current > 0)
+        b = -ratios
+        b[np.diag_indices(n)] = ratios.sum(axis=1)
+        coords = inverse @ (b @ coords)
+    return (coords - coords.mean(axis=0)) * EDGE_LENGTH
+
+
+def pivot_layout(n, pairs, pivots=PIVOTS):
+    """Coordinates of ``n`` nodes for the graphs too large for ``stress_layout``. Each connected component is
+    placed on its own, the ones of more than ``pivots`` nodes by pivot MDS, and the components are laid side by side
+    in rows. Pivot MDS is classical MDS over the graph distances to a few pivot nodes only, so it takes a breadth
+    first search per pivot over the sparse adjacency and grows linearly with the graph."""
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+    count, labels = connected_components(_adjacency(n, pairs), directed=False)
+    if count == 1:
+        return _pivot_mds(n, pairs, pivots)
+    # Índice de cada nodo dentro de su componente
+    order = np.argsort(labels, kind='stable')
+    sizes = np.bincount(labels)
+    local = np.empty(n, dtype=int)
+    local[order] = np.arange(n) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    members = np.split(order, np.cumsum(sizes)[:-1])
+    pair_order = np.argsort(labels[pairs[:, 0]], kind='stable')
+    component_pairs = np.split(local[pairs[pair_order]], np.cumsum(np.bincount(labels[pairs[:, 0]],
+                                                                              minlength=count))[:-1])
+    placed = []
+    for label in np.argsort(-sizes, kind='stable'):
+        size = sizes[label]
+        if size <= pivots:
+            placed.append((label, stress_layout(size, component_pairs[label])))
+        else:
+            placed.append((label, _pivot_mds(size, component_pairs[label], pivots)))
+    coords = np.empty((n, 2))
+    boxes = [component.max(axis=0) - component.min(axis=0) + EDGE_LENGTH for label, component in placed]
+    width = max(np.sqrt(sum(box.prod() for box in boxes)), max(box[0] for box in boxes))
+    x = y = row_height = 0.0
+    for (label, component), box in zip(placed, boxes):
+        if x > 0 and x + box[0] > width:
+            x, y, row_height = 0.0, y + row_height, 0.0
+        coords[members[label]] = component - component.min(axis=0) + (x, y)
+        x += box[0]
+        row_height = max(row_height, box[1])
+    return coords - coords.mean(axis=0)
+
+
+def _pivot_mds(n, pairs, pivots):
+    """Pivot MDS of a connected graph, each pivot the node farthest from the ones chosen before, with the median
+    edge scaled to ``EDGE_LENGTH``. Nodes at the same distance of every pivot, such as the leaves of a star, would
+    overlap: they're spread around their shared place in a spiral."""
+    adjacency = _adjacency(n, pairs)
+    pivots = min(pivots, n)
+    distances = np.empty((n, pivots))
+    nearest = np.full(n, np.inf)
+    pivot = 0
+    for column in range(pivots):
+        distances[:, column] = shortest_path(adjacency, directed=False, unweighted=True, indices=pivot)
+        nearest = np.minimum(nearest, distances[:, column])
+        pivot = int(np.argmax(nearest))
+    squared = distances ** 2
+    centered = -0.5 * (squared - squared.mean(axis=0) - squared.mean(axis=1)[:, None] + squared.mean())
+    vectors, values, _ = np.linalg.svd(centered, full_matrices=False)
+    coords = _fix_signs(vectors[:, :2] * values[:2])
+    coords -= coords.mean(axis=0)
+    lengths = np.linalg.norm(coords[pairs[:, 0]] - coords[pairs[:, 1]], axis=1)
+    scale = np.median(lengths) if len(lengths) else 0
+    coords *= EDGE_LENGTH / scale if scale > 0 else EDGE_LENGTH
+
+    # Espiral de girasol alrededor de cada lugar compartido por varios nodos
+    _, shared = np.unique(coords.round(1), axis=0, return_inverse=True)
+    shared = shared.ravel()
+    order = np.argsort(shared, kind='stable')
+    counts = np.bincount(shared)
+    rank = np.empty(n)
+    rank[order] = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+    radius, angle = 0.3 * EDGE_LENGTH * np.sqrt(rank), rank * np.pi * (3 - np.sqrt(5))
+    return coords + np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
@@ -0,0 +1,56 @@
+"""JSON serialization of the API responses, with orjson when it's installed and the standard library otherwise."""
+
+import json
+import uuid
+
+from cornice.renderer import CorniceRenderer
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+def _plain_default(obj):
+    "Types orjson handles natively, converted for the standard library encoder"
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(value, default=None):
+    """Serializes a value straight to UTF-8 bytes. UUIDs and NumPy arrays and scalars are serialized natively;
+    ``default`` is called for any other unsupported object."""
+    if orjson is not None:
+        return orjson.dumps(value, default=default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+    def fallback(obj):
+        try:
+            return _plain_default(obj)
+        except TypeError:
+            if default is None:
+                raise
+            return default(obj)
+    return json.dumps(value, default=fallback, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONRenderer(CorniceRenderer):
+    """Cornice's renderer (content negotiation, empty 204 responses, ``__json__`` and adapters) serializing with
+    ``dumps``. The bytes go to the response body as they are, without an intermediate str."""
+
+    def render(self, value, system):
+        request = system.get("request")
+        if request is not None:
+            response = request.response
+            if response.status_code == 204:
+                response.content_type = None
+                return b""
+            offers = request.accept.acceptable_offers(offers=self.acceptable)
+            response.content_type = offers[0][0] if offers else self.acceptable[0]
+        return dumps(value, default=self._make_default(request))
+
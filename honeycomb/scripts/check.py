@@ -0,0 +1,37 @@
+"""Verifica la integridad de los índices de nodos y aristas del BeeHive y, opcionalmente, los repara."""
+
+import argparse
+import sys
+
+import transaction
+
+from .env import app_env
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="honeycomb-check",
+        description="Busca aristas huérfanas e índices inversos desactualizados en la base de datos."
+    )
+    parser.add_argument("config_uri", help="Ruta al archivo .ini, por ejemplo development.ini")
+    parser.add_argument("--repair", action="store_true", help="Corrige los problemas encontrados")
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    with app_env(args.config_uri) as env:
+        root = env['root']
+        with transaction.manager:
+            problems = root.check_integrity(repair=args.repair)
+        for problem in problems:
+            print(problem)
+        if not problems:
+            print("Sin problemas")
+        elif args.repair:
+            print(f"{len(problems)} problemas reparados")
+    return 1 if problems and not args.repair else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
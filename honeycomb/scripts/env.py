@@ -0,0 +1,16 @@
+"""Arranque común de los scripts de consola."""
+
+from contextlib import contextmanager
+
+from pyramid.paster import bootstrap, setup_logging
+import transaction
+
+
+@contextmanager
+def app_env(config_uri):
+    "Sets up logging and bootstraps the application of the .ini file, yielding its environment with the root stored"
+    setup_logging(config_uri)
+    with bootstrap(config_uri) as env:
+        # appmaker pudo haber creado la raíz al abrir una base de datos vacía
+        transaction.commit()
+        yield env
@@ -0,0 +1,59 @@
+"""Importa un grafo desde un archivo JSON grande, leyéndolo por partes y confirmando la transacción por lotes."""
+
+import argparse
+import sys
+
+import transaction
+
+from ..models.importer import import_graph
+from .env import app_env
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="honeycomb-import",
+        description="Importa un grafo (JSON con listas de nodos y aristas) en un honeycomb sin cargar el archivo completo en memoria."
+    )
+    parser.add_argument("config_uri", help="Ruta al archivo .ini, por ejemplo development.ini")
+    parser.add_argument("path", help="Archivo JSON del grafo, o - para leerlo de la entrada estándar")
+    parser.add_argument("honeycomb", help="Nombre del honeycomb donde se agrega el grafo")
+    parser.add_argument("name", help="Nombre del grafo; si ya existe, se completa con los nodos y aristas que le falten")
+    parser.add_argument("--title", default="", help="Título del grafo")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Nodos y aristas por transacción")
+    parser.add_argument("--savepoint-size", type=int, default=500, help="Nodos y aristas entre savepoints")
+    return parser.parse_args(argv[1:])
+
+
+def report(stats):
+    print(f"{stats.nodes} nodos, {stats.edges} aristas, {stats.skipped} omitidos "
+          f"en {stats.elapsed:.1f} s ({stats.rate:.0f} elementos/s)", flush=True)
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    if args.batch_size < 1 or args.savepoint_size < 1:
+        print("El tamaño de lote y de savepoint deben ser positivos", file=sys.stderr)
+        return 2
+
+    with app_env(args.config_uri) as env:
+        root = env['root']
+        honeycomb = root.get(args.honeycomb)
+        if honeycomb is None:
+            print(f"No existe el honeycomb {args.honeycomb!r}", file=sys.stderr)
+            return 1
+        stream = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8')
+        try:
+            import_graph(root, honeycomb, stream, args.name, args.title,
+                         args.batch_size, args.savepoint_size, report)
+        except Exception:
+            transaction.abort()
+            raise
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    print(f"Grafo {args.name!r} importado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Migraciones in situ para bases de datos (Data.fs) creadas con versiones anteriores de los modelos."""
+
+import argparse
+import sys
+
+import transaction
+from BTrees._OOBTree import OOBTree
+
+from ..models import CellBuilder, HoneycombGraph
+from ..models.analytics import update_stats
+from ..models.catalog import TextIndex
+from ..models.edges import EdgeSet
+from ..models.folder import BTreeList, Folder
+from .env import app_env
+
+
+STEPS = {}
+
+
+def step(name):
+    "Registers a migration step under the given name"
+    def decorator(func):
+        STEPS[name] = func
+        return func
+    return decorator
+
+
+def walk(resource):
+    "Depth-first iteration over a resource and all of its descendants"
+    yield resource
+    if hasattr(resource, 'values'):
+        for child in list(resource.values()):
+            yield from walk(child)
+
+
+@step('btree-folders')
+def migrate_folders(root):
+    "Rewrites containers pickled as PersistentMapping so their children are stored in an OOBTree"
+    return sum(1 for resource in walk(root) if isinstance(resource, Folder) and resource.migrate())
+
+
+@step('graph-indexes')
+def reindex_graphs(root):
+    "Builds the name, id and adjacency indexes of every HoneycombGraph"
+    count = 0
+    for resource in walk(root):
+        if isinstance(resource, HoneycombGraph):
+            resource.reindex()
+            count += 1
+    return count
+
+
+@step('graph-lists')
+def migrate_graph_lists(root):
+    "Replaces the PersistentList nodes and edges of every HoneycombGraph with BTreeLists"
+    count = 0
+    for resource in walk(root):
+        if isinstance(resource, HoneycombGraph) and not isinstance(resource.nodes, BTreeList):
+            resource.nodes = BTreeList(resource.nodes)
+            resource.edges = BTreeList(resource.edges)
+            count += 1
+    return count
+
+
+@step('edge-sets')
+def migrate_edge_lists(root):
+    "Replaces the PersistentList adjacency lists of the BeeHive with conflict-resolving EdgeSets"
+    count = 0
+    for source_id, edges in list(root.__edges__.items()):
+        if not isinstance(edges, EdgeSet):
+            root.__edges__[source_id] = EdgeSet(edges)
+            count += 1
+    return count
+
+
+@step('edge-sources')
+def rebuild_edge_sources(root):
+    "Builds the target -> sources reverse index of the BeeHive edges"
+    root.rebuild_sources()
+    return len(root.__sources__)
+
+
+@step('explorer-index')
+def index_explorers(root):
+    "Builds the membership index and distance matrix of honeycomb explorers created before the index existed"
+    count = 0
+    for hc in root.values():
+        explorer = getattr(hc, '__explorer__', None)
+        if explorer is not None and getattr(explorer, 'members', None) is None:
+            explorer.update_matrix()
+            count += 1
+    return count
+
+
+@step('walls')
+def index_walls(root):
+    "Builds the per-container WallIndex of cells whose access limits were set before it existed"
+    builder = getattr(root, '__builder__', None) or CellBuilder()
+    count = 0
+    for resource in walk(root):
+        limits = getattr(resource, '__limits__', None)
+        if limits is not None and getattr(resource, '__parent__', None) is not None:
+            builder.set_walls(resource, limits)
+            count += 1
+    return count
+
+
+@step('edge-ids')
+def assign_edge_ids(root):
+    "Stores an id in the graph edges created before CellEdge had one: their name, which already keyed the indexes"
+    count = 0
+    for resource in walk(root):
+        if isinstance(resource, HoneycombGraph):
+            for edge in resource.edges:
+                if edge.id is None:
+                    edge.id = edge.name
+                    count += 1
+    return count
+
+
+@step('catalog')
+def build_catalog(root):
+    "Creates the full-text index and indexes every resource below the BeeHive"
+    root.__catalog__ = catalog = TextIndex()
+    for resource in walk(root):
+        if resource is not root and getattr(resource, 'id', None) is not None:
+            catalog.index_node(resource)
+    return len(catalog)
+
+
+@step('interaction-stats')
+def build_interaction_stats(root):
+    """Recomputes the per-node and per-honeycomb interaction aggregates from the sipping records in the database.
+    Records kept in a segment log aren't in the database: their stats start over with the next write of each key."""
+    root.__node_stats__ = OOBTree()
+    root.__hc_stats__ = OOBTree()
+    root.__stats_applied__ = OOBTree()
+    records = getattr(root, '__sipping__', None) or {}
+    for key, record in records.items():
+        update_stats(root, key, None, record.value)
+    return len(records)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="honeycomb-migrate",
+        description="Aplica migraciones in situ a la base de datos configurada en el archivo .ini."
+    )
+    parser.add_argument("config_uri", help="Ruta al archivo .ini, por ejemplo development.ini")
+    parser.add_argument(
+        "steps",
+        nargs="*",
+        help=f"Pasos a ejecutar (por defecto todos): {', '.join(STEPS)}"
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    unknown = [name for name in args.steps if name not in STEPS]
+    if unknown:
+        print(f"Pasos desconocidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    with app_env(args.config_uri) as env:
+        root = env['root']
+        for name in args.steps or STEPS:
+            with transaction.manager:
+                count = STEPS[name](root)
+            print(f"{name}: {count} objetos migrados")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
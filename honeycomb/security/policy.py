@@ -50,7 +50,7 @@ class SecurityPolicy:
 
         if identity is None:
             return Denied("You need to sign in to view this contents")
-        elif permission == 'read':
+        elif permission in ('read', 'view'):
             if CellBuilder.has_access(context, identity):
                 return Allowed('Access granted for user %s', identity['username'])
             else:
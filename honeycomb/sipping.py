@@ -0,0 +1,355 @@
+"""Storage backends for the sipping interaction records, keyed by ``user:node``.
+
+``ZODBSippingStore`` keeps the records in a BTree of the application root: they are committed with the request's
+transaction and shared by every process using the database. ``QueuedSippingStore`` writes the same records through
+an ``EventQueue``, one transaction per batch of interactions. ``SegmentLogStore`` appends them to segment files on
+local disk with write-behind batching, for a single process which can't afford a ZODB commit per interaction.
+
+Whatever the store, every write updates the per-node and per-honeycomb aggregates of ``models.analytics``: in the
+same transaction for the beehive stores, and through an ``EventQueue`` for the segment log."""
+
+import atexit
+import json
+import logging
+import os
+import threading
+
+from persistent import Persistent
+from BTrees._OOBTree import OOBTree
+from pyramid_zodbconn import get_connection
+import zc.lockfile
+
+from .cache import LRUCache
+from .events import EventQueue
+from .models.analytics import apply_record, update_stats
+
+
+log = logging.getLogger(__name__)
+
+STORE_MODES = 'zodb', 'batched', 'segments'
+FSYNC_POLICIES = 'always', 'batch', 'never'
+
+
+class SippingRecord(Persistent):
+    "The value of a key in its own record, so updating it doesn't write the BTree bucket holding it"
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ZODBSippingStore:
+    """Records in the ``__sipping__`` BTree of the beehive, created on the first write. Concurrent inserts of
+    different keys are resolved by the bucket, and updates only touch the key's own record."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, key, default=None):
+        tree = getattr(self.root, '__sipping__', None)
+        record = tree.get(key) if tree is not None else None
+        return record.value if record is not None else default
+
+    def put(self, key, value):
+        tree = getattr(self.root, '__sipping__', None)
+        if tree is None:
+            tree = self.root.__sipping__ = OOBTree()
+        record = tree.get(key)
+        previous = record.value if record is not None else None
+        if record is None:
+            tree[key] = SippingRecord(value)
+        else:
+            record.value = value
+        update_stats(self.root, key, previous, value)
+
+
+class SegmentLogStore:
+    """Append-only log of JSON lines split in numbered segment files. Only the location of the latest record of each
+    key is kept in memory; recently used records are cached in a bounded LRU.
+
+    Writes are queued and appended by a background thread every ``flush_interval`` seconds, or as soon as
+    ``batch_size`` records are waiting. The ``fsync`` policy decides durability: ``always`` appends and syncs before
+    ``put`` returns, ``batch`` syncs every flushed batch and ``never`` leaves it to the OS. When superseded records
+    take more than half of the log, live records are rewritten into a fresh segment and the old ones removed."""
+
+    def __init__(self, path, fsync='batch', flush_interval=1.0, batch_size=256, cache_entries=10000,
+                 cache_bytes=16 * 1024 * 1024, segment_bytes=64 * 1024 * 1024):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.segment_bytes = segment_bytes
+        # Un solo proceso puede escribir en el directorio
+        self.lock_file = zc.lockfile.LockFile(os.path.join(path, 'lock'))
+        self.lock = threading.Lock()  # índice, pendientes y caché
+        self.write_lock = threading.Lock()  # archivos de segmento
+        self.wakeup = threading.Condition(self.lock)
+        self.index = {}  # llave -> (segmento, posición, longitud)
+        self.pending = {}
+        self.flushing = {}
+        self.cache = LRUCache(cache_entries, cache_bytes)
+        self.live_bytes = 0
+        self.total_bytes = 0
+        self.segment = 0
+        self.closed = False
+        self._load()
+        self.thread = None
+        if fsync != 'always':
+            self.thread = threading.Thread(target=self._flush_loop, name='honeycomb-sipping', daemon=True)
+            self.thread.start()
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, f'{number:08d}.log')
+
+    def _segments(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.path) if name.endswith('.log') and name[:-4].isdigit())
+
+    def _load(self):
+        "Rebuilds the index scanning the segments in order, dropping a record left half written by a crash"
+        for number in self._segments():
+            offset = 0
+            with open(self._segment_path(number), 'rb+') as segment:
+                for line in segment:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError(line)
+                        key = json.loads(line)['k']
+                    except (ValueError, KeyError):
+                        log.warning("Truncating %s at %d, incomplete record", self._segment_path(number), offset)
+                        segment.truncate(offset)
+                        break
+                    self._locate(key, (number, offset, len(line)))
+                    offset += len(line)
+            self.total_bytes += offset
+            self.segment = number
+
+    def _locate(self, key, location):
+        previous = self.index.get(key)
+        if previous is not None:
+            self.live_bytes -= previous[2]
+        self.index[key] = location
+        self.live_bytes += location[2]
+
+    def get(self, key, default=None):
+        with self.lock:
+            line = self.pending.get(key) or self.flushing.get(key) or self.cache.get(key)
+            if line is None:
+                location = self.index.get(key)
+                if location is None:
+                    return default
+                line = self._read(location)
+                self.cache.put(key, line)
+        return json.loads(line)['v']
+
+    def _read(self, location):
+        number, offset, length = location
+        with open(self._segment_path(number), 'rb') as segment:
+            segment.seek(offset)
+            return segment.read(length)
+
+    def put(self, key, value):
+        line = (json.dumps({'k': key, 'v': value}, separators=(',', ':')) + '\n').encode('utf-8')
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("The sipping store is closed")
+            self.pending[key] = line
+            self.cache.put(key, line)
+            if len(self.pending) >= self.batch_size:
+                self.wakeup.notify()
+        if self.fsync == 'always':
+            self.flush()
+
+    def flush(self):
+        "Appends the queued records to the active segment and updates the index"
+        with self.write_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.flushing = batch
+            if not batch:
+                return
+            try:
+                locations = self._append(batch)
+            except Exception:
+                with self.lock:
+                    # Se vuelven a encolar, salvo las llaves escritas de nuevo mientras tanto
+                    self.pending = {**batch, **self.pending}
+                    self.flushing = {}
+                raise
+            with self.lock:
+                for key, location in locations.items():
+                    self._locate(key, location)
+                self.flushing = {}
+            if self.total_bytes > self.segment_bytes and self.total_bytes > 2 * self.live_bytes:
+                self._compact()
+
+    def _append(self, batch):
+        locations = {}
+        path = self._segment_path(self.segment)
+        segment = open(path, 'ab')
+        try:
+            offset = segment.tell()
+            for key, line in batch.items():
+                if offset >= self.segment_bytes:
+                    self._sync(segment)
+                    segment.close()
+                    self.segment += 1
+                    segment = open(self._segment_path(self.segment), 'ab')
+                    offset = 0
+                segment.write(line)
+                locations[key] = (self.segment, offset, len(line))
+                offset += len(line)
+                self.total_bytes += len(line)
+            self._sync(segment)
+        finally:
+            segment.close()
+        return locations
+
+    def _sync(self, segment):
+        segment.flush()
+        if self.fsync != 'never':
+            os.fsync(segment.fileno())
+
+    def _compact(self):
+        "Rewrites the live records into a new segment and removes the older ones; the write lock must be held"
+        with self.lock:
+            old = self._segments()
+            self.segment = old[-1] + 1 if old else 0
+            live = {key: self._read(location) for key, location in self.index.items()}
+            self.total_bytes = 0
+            locations = self._append(live)
+            self.index = {}
+            self.live_bytes = 0
+            for key, location in locations.items():
+                self._locate(key, location)
+            for number in old:
+                os.remove(self._segment_path(number))
+        log.info("Compacted sipping log to %d records", len(locations))
+
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                if not self.closed and len(self.pending) < self.batch_size:
+                    self.wakeup.wait(self.flush_interval)
+                closed = self.closed
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Couldn't flush the sipping log")
+            if closed:
+                return
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.wakeup.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+        self.lock_file.close()
+
+
+class LoggedSippingStore:
+    """Keeps the records in the segment log and their aggregates in the beehive, updated by the stats event queue in
+    batches with ``apply_record``, so writes don't commit the request's transaction. The stats are queued before the
+    record is logged: a full queue rejects the write and the client retries it."""
+
+    def __init__(self, store, queue):
+        self.store = store
+        self.queue = queue
+
+    def get(self, key, default=None):
+        return self.store.get(key, default)
+
+    def put(self, key, value):
+        self.queue.put(key, value)
+        self.store.put(key, value)
+
+
+def record_interaction(root, key, value):
+    "Writes an interaction record to the beehive, from a request or from a batch of the event queue"
+    ZODBSippingStore(root).put(key, value)
+
+
+class QueuedSippingStore:
+    "Reads from the beehive and writes through the event queue, seeing the writes the queue hasn't committed yet"
+
+    def __init__(self, queue, root):
+        self.queue = queue
+        self.root = root
+
+    def get(self, key, default=None):
+        value = self.queue.get(key, _marker)
+        if value is _marker:
+            return ZODBSippingStore(self.root).get(key, default)
+        return value
+
+    def put(self, key, value):
+        self.queue.put(key, value)
+
+
+_marker = object()
+_queue_lock = threading.Lock()
+
+
+def _event_queue(request, attribute, apply):
+    "An event queue of the registry, started with the database of the first request using it"
+    registry = request.registry
+    if getattr(registry, attribute) is None:
+        with _queue_lock:
+            if getattr(registry, attribute) is None:
+                settings = registry.settings
+                queue = EventQueue(
+                    get_connection(request).db(),
+                    apply,
+                    batch_size=int(settings.get('honeycomb.sipping.batch_size', 256)),
+                    flush_interval=float(settings.get('honeycomb.sipping.flush_interval', 1.0)),
+                    max_depth=int(settings.get('honeycomb.sipping.max_queue', 10000)),
+                )
+                atexit.register(queue.close)
+                setattr(registry, attribute, queue)
+    return getattr(registry, attribute)
+
+
+def get_event_queue(request):
+    "The queue writing the sipping records to the beehive in the batched mode"
+    return _event_queue(request, 'sipping_queue', record_interaction)
+
+
+def get_stats_queue(request):
+    "The queue applying the records of the segment log to the interaction stats"
+    return _event_queue(request, 'stats_queue', apply_record)
+
+
+def get_sipping_store(request):
+    "The configured store: the application's segment log, or the beehive of the request, directly or queued"
+    if request.registry.sipping_mode == 'batched':
+        return QueuedSippingStore(get_event_queue(request), request.root)
+    store = request.registry.sipping_store
+    if store is None:
+        return ZODBSippingStore(request.root)
+    return LoggedSippingStore(store, get_stats_queue(request))
+
+
+def includeme(config):
+    settings = config.get_settings()
+    mode = settings.get('honeycomb.sipping.store', 'zodb')
+    if mode not in STORE_MODES:
+        raise ValueError(f"honeycomb.sipping.store must be one of {', '.join(STORE_MODES)}")
+    store = None
+    if mode == 'segments':
+        store = SegmentLogStore(
+            settings['honeycomb.sipping.path'],
+            fsync=settings.get('honeycomb.sipping.fsync', 'batch'),
+            flush_interval=float(settings.get('honeycomb.sipping.flush_interval', 1.0)),
+            batch_size=int(settings.get('honeycomb.sipping.batch_size', 256)),
+            cache_entries=int(settings.get('honeycomb.sipping.cache_entries', 10000)),
+        )
+        atexit.register(store.close)
+    config.registry.sipping_mode = mode
+    config.registry.sipping_store = store
+    config.registry.sipping_queue = None
+    config.registry.stats_queue = None
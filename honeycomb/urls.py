@@ -0,0 +1,55 @@
+"""URLs of the BeeHive nodes built from a path cached on each node. A cached path is trusted without looking at the
+ancestors of the node until a container changes its children: the containers call ``invalidate_paths`` as children
+are set, deleted or renamed, and the paths are built again, once each, from then on."""
+
+from pyramid.traversal import quote_path_segment
+
+# Cambia cada vez que un contenedor cambia sus hijos; las rutas guardadas con otro valor se rehacen
+_generation = [0]
+
+
+def invalidate_paths():
+    "Drops the cached paths of every node, to be called after a container sets, deletes or renames its children"
+    _generation[0] += 1
+
+
+def _path_entry(node):
+    """The (generation, path tuple, name, quoted path) of a node, kept in its volatile ``_v_path`` attribute. The
+    entry is used as is while no container has changed its children since it was built; otherwise it's built again
+    from the entry of the parent. Volatile attributes are never stored and are dropped when a change from another
+    connection invalidates the node."""
+    generation = _generation[0]
+    entry = getattr(node, '_v_path', None)
+    if entry is not None and entry[0] == generation:
+        return entry
+    parent = node.__parent__
+    name = node.__name__ or ''
+    if parent is None:
+        path, quoted = (name,), (quote_path_segment(name) + '/' if name else '/')
+    else:
+        parent_entry = _path_entry(parent)
+        path, quoted = parent_entry[1] + (name,), parent_entry[3] + quote_path_segment(name) + '/'
+    entry = node._v_path = (generation, path, name, quoted)
+    return entry
+
+
+def resource_path_tuple(node):
+    "Same as ``pyramid.traversal.resource_path_tuple``, from the cached path of the node"
+    return _path_entry(node)[1]
+
+
+def node_url(request):
+    """``request.node_url(node, *elements)``: the same URL as ``request.resource_url(node, *elements)`` for the
+    BeeHive nodes, from their cached paths and the application URL computed once per request."""
+    app_url = request.application_url
+
+    def node_url(node, *elements):
+        url = app_url + _path_entry(node)[3]
+        if elements:
+            url += '/'.join(quote_path_segment(element) for element in elements)
+        return url
+    return node_url
+
+
+def includeme(config):
+    config.add_request_method(node_url, 'node_url', reify=True)
@@ -1,12 +1,61 @@
 import uuid
+import itertools
 import math
 from cornice.resource import resource
+from persistent import Persistent
 from pyramid import traversal
+from pyramid.httpexceptions import HTTPAccepted, HTTPNotModified
+from pyramid_zodbconn import get_connection
 from ..models import *
+from ..models.analytics import InteractionStats, stats_for
+from ..models.changes import changes_since, format_tid, parse_tid
+from ..models.edges import EdgeSet
+from ..cache import get_cache, state_tag
+from ..events import QueueFull
+from ..live import TooManySubscribers, get_broker
+from ..renderers import dumps
+from ..sipping import get_sipping_store
+from ..workers import schedule
 import logging
 
 log = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 200
+
+
+def page_params(request):
+    """Reads the ``cursor`` (last key of the previous page) and ``limit`` query parameters. The limit is None if it
+    isn't a positive integer."""
+    cursor = request.params.get('cursor') or None
+    try:
+        limit = min(int(request.params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return cursor, None
+    return cursor, limit if limit > 0 else None
+
+
+def page(tree, cursor, limit):
+    """Takes up to ``limit`` (key, value) pairs of a BTree following the cursor key, loading only that key range.
+    Returns them with the cursor of the next page, None on the last one."""
+    pairs = list(itertools.islice(tree.items(min=cursor, excludemin=cursor is not None), limit + 1))
+    if len(pairs) > limit:
+        return pairs[:limit], pairs[limit - 1][0]
+    return pairs, None
+
+
+def fields_param(request):
+    "The set of field names requested with ``fields=a,b``, or None for every field"
+    fields = request.params.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+def project(item, fields):
+    return item if fields is None else {key: value for key, value in item.items() if key in fields}
+
 
 @resource(collection_path='/api/v1/honeycombs', path='/api/v1/honeycombs/{name}', cors_origins=('*',), factory='honeycomb.root_factory')
 class HoneycombResource:
@@ -15,31 +64,59 @@ class HoneycombResource:
         self.context = context
 
     def collection_get(self):
-        """Get the list of honeycombs"""
-        honeycombs = []
-        root = traversal.find_root(resource=self.context)
-        for hc in self.request.root.values():
-            honeycombs.append({
+        """Get a page of the list of honeycombs, ``next`` is the cursor of the following page"""
+        cursor, limit = page_params(self.request)
+        if limit is None:
+            self.request.response.status = 400
+            return {'error': 'limit must be a positive integer'}
+        fields = fields_param(self.request)
+        pairs, next_cursor = page(self.request.root, cursor, limit)
+        honeycombs = [
+            project({
                 'id': hc.__name__,
                 'title': hc.title,
                 'icon': hc.icon,
-            })
-        return {'honeycombs': honeycombs}
+            }, fields) for name, hc in pairs
+        ]
+        return {'honeycombs': honeycombs, 'next': next_cursor}
 
     def get(self):
-        """Get a honeycomb's children nodes by name"""
+        """Get a honeycomb's children nodes by name. The serialized layout is cached under a strong ETag computed
+        from the ZODB serials of the honeycomb and its visible children, so it's rebuilt only after one of them
+        changes."""
         hc = self.request.root[self.request.matchdict['name']]
         if not hc:
             self.request.response.status = 404
             return {'error': 'Honeycomb with that name was not found'}
 
+        cells = [cell for name, cell in CellBuilder.visible_cells(hc, getattr(self.request, 'identity', None))]
+        etag = state_tag([hc] + cells, self.request.application_url)
+        if etag is None:
+            # Cambios aún sin confirmar: no hay serial que los identifique
+            return self.layout(hc, cells)
+        if etag in self.request.if_none_match:
+            return HTTPNotModified(headers={'ETag': f'"{etag}"'})
+
+        cache = get_cache(self.request, 'layouts')
+        body = cache.get(etag)
+        if body is None:
+            body = dumps(self.layout(hc, cells))
+            cache.put(etag, body)
+        response = self.request.response
+        response.content_type = 'application/json'
+        response.etag = etag
+        response.body = body
+        return response
+
+    def layout(self, hc, cells):
+        "Places the honeycomb in the centre and its cells at their stored position, or around it in a circle"
         # Nodo raíz (el Honeycomb mismo)
         hc_node = {
-            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, self.request.resource_url(hc))),
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, self.request.node_url(hc))),
             "data": {
                 "label": hc.title,
                 "themeColor": "root",
-                "url": self.request.resource_url(hc),
+                "url": self.request.node_url(hc),
                 "icon": hc.icon,
             },
             "position": {"x": 0, "y": 0},  # en el centro
@@ -49,7 +126,6 @@ class HoneycombResource:
         }
 
         # Nodos hijos distribuidos en círculo
-        cells = hc.values()
         n = len(cells)
         radius = 300
         child_nodes = []
@@ -57,13 +133,16 @@ class HoneycombResource:
             angle = 2 * math.pi * i / n if n > 0 else 0
             x = radius * math.cos(angle)
             y = radius * math.sin(angle)
+            position = getattr(cell, 'position', None)
+            if position and 'x' in position and 'y' in position:
+                x, y = position['x'], position['y']
 
             child_nodes.append({
                 "id": str(cell.id),
                 "data": {
                     "label": cell.title,
                     "themeColor": "default",
-                    "url": self.request.resource_url(cell),
+                    "url": self.request.node_url(cell),
                     "icon": getattr(cell, 'icon', None),
                 },
                 "position": {"x": x, "y": y},
@@ -90,6 +169,192 @@ class HoneycombResource:
             "edges": edges,
         }
 
+class NeighbourhoodMixin:
+    """Shared lookup of the honeycomb explorer for the spatial recommendation resources. While the explorer has cell
+    changes to apply they answer from the last computed matrix, marked ``stale``, and 202 only if there is none."""
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def explorer(self):
+        """The honeycomb's explorer. Pending cell changes are handed to the background worker, as the matrix views
+        do, and ``dirty`` stays true until it applies them."""
+        hc = self.request.root.get(self.request.matchdict['name'])
+        explorer = getattr(hc, '__explorer__', None)
+        if explorer is not None and explorer.dirty:
+            schedule(self.request, explorer, HoneycombExplorer.refresh)
+        return explorer
+
+    def pending(self):
+        return HTTPAccepted(json_body={'status': 'pending'}, headers={'Retry-After': '1'})
+
+    def respond(self, explorer, pairs):
+        if pairs is None:
+            if explorer is not None and explorer.dirty:
+                # La celda puede estar entre los cambios que aún no se aplican
+                return self.pending()
+            self.request.response.status = 404
+            return {'error': 'Node not found in this honeycomb'}
+        return {
+            'id': self.request.matchdict['node_id'],
+            'stale': explorer.dirty,
+            'neighbours': [
+                {
+                    'id': str(cell.id),
+                    'label': getattr(cell, 'title', ''),
+                    'url': self.request.node_url(cell),
+                    'distance': distance,
+                } for cell, distance in pairs
+            ],
+        }
+
+    def number(self, name, default, cast):
+        "Reads a numeric query parameter, returning None when it can't be parsed"
+        try:
+            return cast(self.request.params.get(name, default))
+        except ValueError:
+            return None
+
+
+@resource(path='/api/v1/honeycombs/{name}/events', cors_origins=('*',), factory='honeycomb.root_factory')
+class HoneycombEventsResource:
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        """Server-sent events with the node and edge changes of a honeycomb as they are committed"""
+        name = self.request.matchdict['name']
+        if name not in self.request.root:
+            self.request.response.status = 404
+            return {'error': 'Honeycomb with that name was not found'}
+        broker = get_broker(self.request)
+        try:
+            subscription = broker.subscribe(name)
+        except TooManySubscribers:
+            self.request.response.status = 503
+            self.request.response.headers['Retry-After'] = str(int(broker.retry))
+            return {'error': 'Too many live connections, try again later'}
+        # El tid se lee después de suscribirse: lo que se confirme luego llega como evento
+        tid = get_connection(self.request).db().lastTransaction()
+        response = self.request.response
+        response.content_type = 'text/event-stream'
+        response.cache_control = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.app_iter = broker.stream(subscription, tid)
+        return response
+
+
+@resource(path='/api/v1/honeycombs/{name}/neighbours/{node_id}', cors_origins=('*',), factory='honeycomb.root_factory')
+class NeighboursResource(NeighbourhoodMixin):
+    def get(self):
+        """Get the k cells nearest to a node according to the honeycomb axes"""
+        k = self.number('k', 5, int)
+        if k is None or k < 1:
+            self.request.response.status = 400
+            return {'error': 'k must be a positive integer'}
+        explorer = self.explorer()
+        if explorer is not None and not explorer.computed:
+            return self.pending()
+        return self.respond(explorer, explorer.neighbours(self.request.matchdict['node_id'], k) if explorer else None)
+
+
+@resource(path='/api/v1/honeycombs/{name}/radius/{node_id}', cors_origins=('*',), factory='honeycomb.root_factory')
+class RadiusResource(NeighbourhoodMixin):
+    def get(self):
+        """Get the cells within distance r of a node according to the honeycomb axes"""
+        r = self.number('r', 1, float)
+        if r is None or not r >= 0:
+            self.request.response.status = 400
+            return {'error': 'r must be a non-negative number'}
+        explorer = self.explorer()
+        if explorer is not None and not explorer.computed:
+            return self.pending()
+        return self.respond(explorer, explorer.within(self.request.matchdict['node_id'], r) if explorer else None)
+
+
+def node_page(root, node_id, node, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """The children of a node in a page, the edges to serialize with them and the cursor of the next page. Children
+    are paged by id for graphs and by name for containers. Graph pages carry the edges leaving their nodes,
+    container edges come with the first page."""
+    if hasattr(node, "nodes") and hasattr(node, "edges"):
+        if not node._has_indexes():
+            return list(node.nodes), list(node.edges), None
+        pairs, next_cursor = page(node.__by_id__, cursor, limit)
+        children = [child for child_id, child in pairs]
+        return children, [edge for child in children for edge in node.out_edges(child.id)], next_cursor
+    if hasattr(node, "values"):
+        pairs, next_cursor = page(node, cursor, limit)
+        edges = root.__edges__.get(node_id, []) if cursor is None else []
+        return [child for name, child in pairs], edges, next_cursor
+    return [], [], None
+
+
+def schedule_layout(request, node):
+    """Hands the layout of a graph imported or edited since its last one to the background worker, once per graph,
+    so GETs don't write to the database nor wait for it: they serve the positions stored so far. The commits editing
+    a graph already ask for its layout through ``layout_listeners``; this catches the graphs left pending before."""
+    if not getattr(node, 'layout_dirty', False):
+        return
+    schedule(request, node, HoneycombGraph.apply_layout, ('layout', node._p_oid))
+
+
+def serialize_node(request, root, node_id, node, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None, found=None):
+    """Serializes a node and a page of its children, ``next`` is the cursor of the following page and ``fields``
+    selects the keys of each child. ``found`` is the result of ``node_page`` when it was already called."""
+    children, edges, next_cursor = found or node_page(root, node_id, node, cursor, limit)
+    data = {
+        "id": str(node.id),
+        "label": getattr(node, "title", ""),
+        "contents": getattr(node, "contents", ""),
+        "url": request.node_url(node),
+        "iconUrl": getattr(node, "icon", None),
+        "nodes": [],
+        "edges": [],
+        "next": next_cursor,
+    }
+
+    if hasattr(node, "nodes") and hasattr(node, "edges"):
+        data["nodes"] = [project({'id': str(child.id), 'label': getattr(child, 'title', ''), 'url': request.node_url(child), 'position': getattr(child, 'position', None) or None}, fields) for child in children]
+        data["edges"] = [{'source': str(edge.from_node.id), 'target': str(edge.to_node.id), 'id': node._edge_key(edge), 'label': edge.title, 'type': "custom-label", 'data': {'hasArrow': False}} for edge in edges]
+
+    elif hasattr(node, "values"):
+        for child in children:
+            data["nodes"].append(project({
+                "id": str(child.id),
+                "label": getattr(child, "title", ""),
+                "url": request.node_url(child),
+                "iconUrl": getattr(child, "icon", None),
+            }, fields))
+        data["edges"] = [edge for edge in edges]
+
+    return data
+
+
+def node_payload(request, root, node_id, node, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+    """The serialized JSON of ``serialize_node`` and its tag. The bytes are kept in the ``nodes`` cache under a tag
+    of the serials of the node, its children in the page and their edges, and of the node's URL, so they're regenerated only after one of
+    them changes. The tag is None while any of them has uncommitted changes."""
+    found = node_page(root, node_id, node, cursor, limit)
+    children, edges = found[:2]
+    objects = [node] + children
+    if isinstance(edges, EdgeSet):
+        objects += edges.tag_objects()
+    elif isinstance(edges, Persistent):
+        objects.append(edges)
+    else:
+        objects += [edge for edge in edges if isinstance(edge, Persistent)]
+    # La URL del nodo cambia si se renombra o mueve alguno de sus ancestros
+    tag = state_tag(objects, request.node_url(node), cursor, limit, fields is None, *sorted(fields or ()))
+    cache = get_cache(request, 'nodes')
+    body = cache.get(tag) if tag is not None else None
+    if body is None:
+        body = dumps(serialize_node(request, root, node_id, node, cursor, limit, fields, found))
+        if tag is not None:
+            cache.put(tag, body)
+    return tag, body
+
+
 @resource(path='/api/v1/node/{node_id}', cors_origins=('*',), factory='honeycomb.root_factory')
 class NodeResource:
     def __init__(self, request, context=None):
@@ -97,8 +362,10 @@ class NodeResource:
         self.context = context
 
     def get(self):
+        """Get a node and a page of its children, see ``serialize_node``. The body is the materialized payload of
+        ``node_payload``, with its tag as a strong ETag. Graphs are laid out again in the background after they
+        change, see ``schedule_layout``."""
         root = traversal.find_root(resource=self.context)
-        log.debug("Nodos en índice: %s", list(root.__nodes__.keys()))
         if not hasattr(root, "__nodes__"):
             root.__nodes__ = OOBTree()
         if not hasattr(root, "__edges__"):
@@ -111,35 +378,156 @@ class NodeResource:
             self.request.response.status = 404
             return {'error': 'Node not found'}
 
-        data = {
-            "id": str(node.id),
-            "label": getattr(node, "title", ""),
-            "contents": getattr(node, "contents", ""),
-            "url": self.request.resource_url(node),
-            "iconUrl": getattr(node, "icon", None),
-            "nodes": [],
-            "edges": [],
-        }
+        cursor, limit = page_params(self.request)
+        if limit is None:
+            self.request.response.status = 400
+            return {'error': 'limit must be a positive integer'}
+        schedule_layout(self.request, node)
+        tag, body = node_payload(self.request, root, node_id, node, cursor, limit, fields_param(self.request))
+        if tag is not None and tag in self.request.if_none_match:
+            return HTTPNotModified(headers={'ETag': f'"{tag}"'})
+        response = self.request.response
+        response.content_type = 'application/json'
+        if tag is not None:
+            response.etag = tag
+        response.body = body
+        return response
+
 
+@resource(path='/api/v1/nodes', cors_origins=('*',), factory='honeycomb.root_factory')
+class NodeBatchResource:
+    """Resolves many nodes in one request: ``GET ?ids=a,b,c`` or ``POST {"ids": [...]}`` for longer lists. Each node
+    is serialized like ``NodeResource`` does (first page of children, ``limit`` and ``fields`` apply to all of them);
+    unknown ids are reported in ``errors`` instead of failing the whole batch."""
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
 
-        if hasattr(node, "nodes") and hasattr(node, "edges"):
-            data["nodes"] = [{'id': str(child.id), 'label': getattr(child, 'title', ''), 'url': self.request.resource_url(child)} for child in node.nodes]
-            data["edges"] = [{'source': str(edge.from_node.id), 'target': str(edge.to_node.id), 'id': getattr(edge, 'id', uuid.uuid4().hex), 'label': edge.title, 'type': "custom-label", 'data': {'hasArrow': False}} for edge in node.edges]
+    def get(self):
+        ids = [node_id.strip() for node_id in self.request.params.get('ids', '').split(',') if node_id.strip()]
+        return self.batch(ids)
 
-        elif hasattr(node, "values"):
-            for child in node.values():
-                data["nodes"].append({
-                    "id": str(child.id),
-                    "label": getattr(child, "title", ""),
-                    "url": self.request.resource_url(child),
-                    "iconUrl": getattr(child, "icon", None),
+    def post(self):
+        try:
+            ids = self.request.json_body.get('ids')
+        except (ValueError, AttributeError):
+            ids = None
+        if not isinstance(ids, list) or not all(isinstance(node_id, str) for node_id in ids):
+            self.request.response.status = 400
+            return {'error': 'Expected a JSON object with a list of string ids'}
+        return self.batch(ids)
+
+    def batch(self, ids):
+        if not ids or len(ids) > MAX_BATCH_SIZE:
+            self.request.response.status = 400
+            return {'error': f'Between 1 and {MAX_BATCH_SIZE} ids are required'}
+        limit = page_params(self.request)[1]
+        if limit is None:
+            self.request.response.status = 400
+            return {'error': 'limit must be a positive integer'}
+        fields = fields_param(self.request)
+
+        root = traversal.find_root(resource=self.context)
+        index = getattr(root, '__nodes__', None) or {}
+        # Se buscan en orden de llave para recorrer los buckets del BTree una sola vez
+        found = {node_id: index.get(node_id) for node_id in sorted(set(ids))}
+        nodes, errors = [], {}
+        for node_id in dict.fromkeys(ids):
+            node = found[node_id]
+            if node is None:
+                errors[node_id] = 'Node not found'
+            else:
+                nodes.append(serialize_node(self.request, root, node_id, node, None, limit, fields))
+        return {'nodes': nodes, 'errors': errors}
+
+
+@resource(path='/api/v1/changes', cors_origins=('*',), factory='honeycomb.root_factory')
+class ChangesResource:
+    """Node and edge changes committed after the transaction id given in ``since``, oldest first, for clients to
+    sync incrementally. Without ``since`` only the current tid is returned, to start syncing from a full load.
+    Transactions too large to list are reported as a ``resync`` change of each honeycomb they touched."""
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        db = get_connection(self.request).db()
+        last = db.lastTransaction()
+        since = self.request.params.get('since')
+        if not since:
+            return {'changes': [], 'next': format_tid(last), 'more': False}
+        limit = page_params(self.request)[1]
+        try:
+            since = parse_tid(since)
+        except ValueError:
+            limit = None
+        if limit is None:
+            self.request.response.status = 400
+            return {'error': 'since must be a transaction id and limit a positive integer'}
+        changes, cursor = changes_since(db, since, limit, self.request.params.get('honeycomb') or None)
+        return {'changes': changes, 'next': format_tid(cursor), 'more': cursor < last}
+
+
+@resource(path='/api/v1/search', cors_origins=('*',), factory='honeycomb.root_factory')
+class SearchResource:
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        """Full-text search over cell titles and contents, ranked and paginated. Cells the user can't view are
+        left out of the page."""
+        query = self.request.params.get('q', '').strip()
+        try:
+            page_no = int(self.request.params.get('page', 1))
+            size = min(int(self.request.params.get('size', 20)), 100)
+        except ValueError:
+            page_no = size = 0
+        if page_no < 1 or size < 1:
+            self.request.response.status = 400
+            return {'error': 'page and size must be positive integers'}
+
+        catalog = getattr(self.request.root, '__catalog__', None)
+        total, hits = catalog.search(query, (page_no - 1) * size, size) if catalog is not None else (0, [])
+        results = []
+        for node_id, score in hits:
+            node = catalog.get(node_id)
+            if node is not None and self.request.has_permission('view', node):
+                results.append({
+                    'id': node_id,
+                    'label': getattr(node, 'title', ''),
+                    'url': self.request.node_url(node),
+                    'score': round(score, 4),
                 })
+        return {'q': query, 'total': total, 'page': page_no, 'size': size, 'results': results}
+
+
+@resource(path='/api/v1/search/suggest', cors_origins=('*',), factory='honeycomb.root_factory')
+class SuggestResource:
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        """Autocomplete of the titles of the cells the user can view starting with the given prefix"""
+        prefix = self.request.params.get('prefix', '')
+        try:
+            limit = min(int(self.request.params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        catalog = getattr(self.request.root, '__catalog__', None)
+        suggestions = []
+        for node_id in (catalog.suggest(prefix, limit) if catalog is not None else []):
+            node = catalog.get(node_id)
+            if node is not None and self.request.has_permission('view', node):
+                suggestions.append({
+                    'id': node_id,
+                    'label': getattr(node, 'title', ''),
+                    'url': self.request.node_url(node),
+                })
+        return {'prefix': prefix, 'suggestions': suggestions}
+
 
-            edges = root.__edges__.get(node_id, [])
-            data["edges"] = [edge for edge in edges]
-            
-        return data
-    
 @resource(path='/api/v1/drones/{userid}', cors_origins=('*',), factory='honeycomb.root_factory')
 class DroneResource:
     def __init__(self, request, context=None):
@@ -178,9 +566,7 @@ class UserIDResource:
             'userid': getattr(user, 'userid'),
         }
 
-sipping_data_store = {}
-
-@resource(path='/api/v1/sipping/{nodeid}', cors_origins=('*',))
+@resource(path='/api/v1/sipping/{nodeid}', cors_origins=('*',), factory='honeycomb.root_factory')
 class SippingResource:
     def __init__(self, request, context=None):
         self.request = request
@@ -191,7 +577,7 @@ class SippingResource:
         user = getattr(self.request, 'identity', None)
         userid = getattr(user, 'userid', getattr(user, 'id', 'anon'))
         key = f"{userid}:{nodeid}"
-        data = sipping_data_store.get(key, {
+        data = get_sipping_store(self.request).get(key, {
             'interacciones_previas': [],
             'estadisticas': {},
             'logros': []
@@ -209,5 +595,58 @@ class SippingResource:
             self.request.response.status = 400
             return {'error': 'Invalid JSON'}
         # Solo permite modificar datos de este nodo
-        sipping_data_store[key] = payload
+        try:
+            get_sipping_store(self.request).put(key, payload)
+        except QueueFull:
+            self.request.response.status = 503
+            self.request.response.headers['Retry-After'] = '1'
+            return {'error': 'Too many pending interactions, please retry'}
         return {'status': 'ok', 'saved': payload}
+
+
+@resource(path='/api/v1/sipping/{nodeid}/stats', cors_origins=('*',), factory='honeycomb.root_factory')
+class SippingStatsResource:
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        """Aggregated interactions of every user with a node, maintained as records are written"""
+        nodeid = self.request.matchdict['nodeid']
+        stats = stats_for(self.request.root, '__node_stats__', nodeid) or InteractionStats()
+        return dict(stats.to_dict(), id=nodeid)
+
+
+@resource(path='/api/v1/honeycombs/{name}/stats', cors_origins=('*',), factory='honeycomb.root_factory')
+class HoneycombStatsResource:
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        """Aggregated interactions with all the nodes of a honeycomb"""
+        name = self.request.matchdict['name']
+        if name not in self.request.root:
+            self.request.response.status = 404
+            return {'error': 'Honeycomb with that name was not found'}
+        stats = stats_for(self.request.root, '__hc_stats__', name) or InteractionStats()
+        return dict(stats.to_dict(), id=name)
+
+
+@resource(path='/api/v1/metrics/interactions', cors_origins=('*',))
+class InteractionMetricsResource:
+    def __init__(self, request, context=None):
+        self.request = request
+        self.context = context
+
+    def get(self):
+        """Depth, counters and flush latency of the event queues of the interactions: the sipping records when they
+        are batched, the stats when the records are kept in the segment log"""
+        registry = self.request.registry
+        queue = registry.sipping_queue
+        stats_queue = getattr(registry, 'stats_queue', None)
+        return {
+            'store': registry.sipping_mode,
+            'queue': queue.metrics() if queue is not None else None,
+            'stats_queue': stats_queue.metrics() if stats_queue is not None else None,
+        }
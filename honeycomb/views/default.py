@@ -1,20 +1,43 @@
+import io
+
+import numpy as np
+from pyramid.renderers import render
 from pyramid.view import view_config
-from pyramid.httpexceptions import HTTPSeeOther, HTTPFound
+from pyramid.httpexceptions import HTTPSeeOther, HTTPFound, HTTPNotFound, HTTPAccepted, HTTPNotModified
 from pyramid_storage.exceptions import FileNotAllowed
 from pyramid_storage import extensions
 from pyramid import traversal
 
+from ..cache import get_cache, state_tag
 from ..models import *
+from ..workers import schedule
+
+
+def cached_fragment(request, template, objects, values, *extra):
+    """Renders a template with the values returned by ``values()``, reusing the last rendering while none of the
+    persistent objects it shows changed. The key also holds the application URL, which carries the prefix set by
+    ForwardedHeadersMiddleware."""
+    tag = state_tag(objects, request.application_url, template, *extra)
+    cache = get_cache(request, 'fragments')
+    html = cache.get(tag) if tag is not None else None
+    if html is None:
+        html = render(template, values(), request=request)
+        if tag is not None:
+            cache.put(tag, html)
+    return html
 
 
 @view_config(context=BeeHive, renderer='templates/beehive.jinja2')
 def beehive_view(context, request):
-    # La vista ahora está limpia y solo prepara los datos para la plantilla.
+    # Cada honeycomb se renderiza por separado y se reutiliza mientras no cambien él o sus celdas visibles
     honeycombs = []
-    for name, hc in context.items():
-        hc_url = request.resource_url(hc)
-        cells = [(cell, request.resource_url(cell)) for cell in hc.values()]
-        honeycombs.append((hc, hc_url, cells))
+    for name, hc in CellBuilder.visible_cells(context, request.identity):
+        cells = [cell for name, cell in CellBuilder.visible_cells(hc, request.identity)]
+        honeycombs.append(cached_fragment(request, 'honeycomb:templates/beehive_honeycomb.jinja2', [hc] + cells, lambda: {
+            'hc': hc,
+            'hc_url': request.node_url(hc),
+            'cells': [(cell, request.node_url(cell)) for cell in cells],
+        }))
     return {
         'project': 'BeeHive Project',
         'title': context.__name__,
@@ -33,7 +56,12 @@ def honeycomb(request):
         map = request.context.map
     else:
         map = None
-    cells = [(request.context[cell], request.resource_url(request.context, cell)) for cell in request.context]
+    visible = CellBuilder.visible_cells(request.context, request.identity)
+    cells = cached_fragment(
+        request, 'honeycomb:templates/honeycomb_cells.jinja2', [request.context] + [cell for name, cell in visible],
+        lambda: {'cells': [(cell, request.node_url(request.context, name)) for name, cell in visible]},
+        *(name for name, cell in visible),
+    )
     return {'project': 'Honeycomb', 'title': honeycomb_title, 'map': map, 'cells': cells}
 
 
@@ -52,15 +80,55 @@ def honeycomb_update(request):
     return HTTPSeeOther(request.resource_url(request.context))
 
 
+def _explorer_distances(request):
+    """Returns the explorer's last good condensed distance matrix, or None if it was never calculated. If cells changed
+    since, the recomputation is handed to the background worker, once per honeycomb, so GETs don't write to the
+    database nor wait for it."""
+    explorer = request.context.__explorer__
+    if explorer.dirty:
+        schedule(request, explorer, HoneycombExplorer.refresh)
+    return getattr(explorer, 'distances', None)
+
+
+def _matrix_response(request, distances):
+    "Answers with 202 while the matrix doesn't exist, 304 if the client has this version, or None to go on"
+    if distances is None:
+        return HTTPAccepted(json_body={'status': 'pending'}, headers={'Retry-After': '1'})
+    etag = request.context.__explorer__.etag
+    request.response.etag = etag
+    if etag in request.if_none_match:
+        return HTTPNotModified(headers={'ETag': request.response.headers['ETag']})
+    return None
+
+
 @view_config(context=Honeycomb, name='matrix', renderer='json')
 def honeycomb_matrix(request):
-    "This view returns a copy of the honeycomb distance matrix triggering its calculation if it isn't already available."
+    "This view returns a copy of the last calculated honeycomb distance matrix, triggering its recalculation if cells changed."
     if hasattr(request.context, '__explorer__'):
-        matrix = request.context.__explorer__.matrix
-        if not matrix:
-            request.context.__explorer__.update_matrix()
-            matrix = request.context.__explorer__.matrix
-        return matrix.tolist()
+        offers = request.accept.acceptable_offers(['application/json', 'application/octet-stream'])
+        if offers and offers[0][0] == 'application/octet-stream':
+            return honeycomb_matrix_npy(request)
+        distances = _explorer_distances(request)
+        return _matrix_response(request, distances) or distances.square().tolist()
+
+
+@view_config(context=Honeycomb, name='matrix.npy')
+def honeycomb_matrix_npy(request):
+    "Binary version of the distance matrix: the condensed float32 array in .npy format."
+    if not hasattr(request.context, '__explorer__'):
+        raise HTTPNotFound()
+    distances = _explorer_distances(request)
+    early = _matrix_response(request, distances)
+    if early is not None:
+        return early
+    body = io.BytesIO()
+    np.save(body, distances.condensed())
+    response = request.response
+    response.content_type = 'application/octet-stream'
+    response.content_disposition = f'attachment; filename="{request.context.__name__}-matrix.npy"'
+    response.headers['X-Matrix-Size'] = str(distances.size)
+    response.body = body.getvalue()
+    return response
 
 
 @view_config(context=CellText, renderer='honeycomb:templates/cell.jinja2')
@@ -76,7 +144,7 @@ def textcell(request):
 def view_cell_node(context, request):
     children = []
     for name, node in context.items():
-        node_url = request.resource_url(node)
+        node_url = request.node_url(node)
         children.append((node, node_url))
     return {
         'project': 'BeeHive Project',
@@ -107,6 +175,7 @@ def edit_cell_text(context, request):
     if 'form.submitted' in request.params:
         context.title = request.params['title']
         context.contents = request.params['contents']
+        traversal.find_root(context).reindex_node(context)
         return HTTPFound(location=request.resource_url(context))
     return {"cell": context}
 
@@ -128,6 +197,7 @@ def edit_cell_richtext(context, request):
     if 'form.submitted' in request.params:
         context.title = request.params['title']
         context.source = request.params['contents']
+        traversal.find_root(context).reindex_node(context)
         return HTTPFound(location=request.resource_url(context))
     return {"cell": context}
 
@@ -149,6 +219,7 @@ def edit_cell_animation(context, request):
         context.title = request.params.get('title', context.title)
         context.href = request.params.get('href', context.href)
         context.icon = request.params.get('icon', context.icon)
+        traversal.find_root(context).reindex_node(context)
         return HTTPFound(location=request.resource_url(context))
     return {"cell": context}
 
@@ -167,6 +238,7 @@ def edit_cell_webcontent(context, request):
     if 'form.submitted' in request.params:
         context.title = request.params['title']
         context.href = request.params['contents']
+        traversal.find_root(context).reindex_node(context)
         return HTTPFound(location=request.resource_url(context))
     return {"cell": context}
 
@@ -186,6 +258,7 @@ def edit_cell_icon(context, request):
     if 'form.submitted' in request.params:
         context.title = request.params.get('title', context.title)
         context.icon = request.params.get('icon', context.icon)
+        traversal.find_root(context).reindex_node(context)
         return HTTPFound(location=request.resource_url(context))
     return {"cell": context}
 
@@ -194,7 +267,7 @@ def honeycomb_graph_view(context, request):
     # Prepara la lista de nodos y sus URLs
     print("DEBUG - Nodos en grafo:", context.nodes)
     print("DEBUG - Aristas en grafo:", context.edges)
-    nodes = [(node, request.resource_url(node)) for node in context.nodes]
+    nodes = [(node, request.node_url(node)) for node in context.nodes]
 
     # Prepara la lista de aristas (edges)
     edges = []
@@ -204,9 +277,9 @@ def honeycomb_graph_view(context, request):
         edges.append({
             "title": getattr(edge, "title", ""),
             "from": getattr(from_node, 'title', getattr(from_node, '__name__', str(from_node))),
-            "from_url": request.resource_url(from_node) if hasattr(from_node, '__name__') else "#",
+            "from_url": request.node_url(from_node) if hasattr(from_node, '__name__') else "#",
             "to": getattr(to_node, 'title', getattr(to_node, '__name__', str(to_node))),
-            "to_url": request.resource_url(to_node) if hasattr(to_node, '__name__') else "#",
+            "to_url": request.node_url(to_node) if hasattr(to_node, '__name__') else "#",
             "kind": getattr(edge, "kind", "")
         })
     return {
@@ -0,0 +1,90 @@
+"""Background jobs that update persistent objects outside of the request/response cycle."""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+from pyramid_zodbconn import get_connection
+import transaction
+from ZODB.POSException import ConflictError
+
+from .models.beehive import HoneycombGraph, layout_listeners
+
+
+log = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """Runs jobs against persistent objects in a thread pool. Each job opens its own ZODB connection, loads the
+    object by oid and commits, retrying on ConflictError. Jobs are deduplicated by key: submitting a key which is
+    already queued or running returns the future of that job (single flight)."""
+
+    def __init__(self, max_workers=2, attempts=3):
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='honeycomb-worker')
+        self.attempts = attempts
+        self.lock = threading.Lock()
+        self.inflight = {}
+
+    def submit(self, db, key, oid, job):
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                return future
+            future = self.inflight[key] = self.executor.submit(self._run, db, oid, job)
+        # Fuera del lock: si el trabajo ya terminó, el callback se ejecuta aquí mismo
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def _run(self, db, oid, job):
+        tm = transaction.TransactionManager()
+        for attempt in range(self.attempts):
+            conn = db.open(tm)
+            try:
+                tm.begin()
+                result = job(conn.get(oid))
+                tm.commit()
+                return result
+            except ConflictError:
+                tm.abort()
+                log.debug("Conflict running %r on %r, attempt %d", job, oid, attempt + 1)
+            except Exception:
+                tm.abort()
+                log.exception("Background job %r on %r failed", job, oid)
+                raise
+            finally:
+                conn.close()
+        log.warning("Giving up %r on %r after %d conflicts", job, oid, self.attempts)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+def get_worker(request):
+    return request.registry.background_worker
+
+
+def schedule(request, obj, job, key=None):
+    """Hands ``job(obj)`` to the request's background worker, once per ``key`` (the object's oid by default). An
+    object not stored yet has no oid to be loaded by, so its job runs right away."""
+    if obj._p_oid is None:
+        return job(obj)
+    db = get_connection(request).db()
+    get_worker(request).submit(db, obj._p_oid if key is None else key, obj._p_oid, job)
+
+
+def layout_scheduler(worker):
+    "A layout listener handing the graphs left pending by a commit to the worker, with the key of ``schedule_layout``"
+    def schedule_layout(graph):
+        worker.submit(graph._p_jar.db(), ('layout', graph._p_oid), graph._p_oid, HoneycombGraph.apply_layout)
+    return schedule_layout
+
+
+def includeme(config):
+    settings = config.get_settings()
+    worker = config.registry.background_worker = BackgroundWorker(int(settings.get('honeycomb.workers', 2)))
+    layout_listeners.append(layout_scheduler(worker))
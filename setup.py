@@ -50,11 +50,17 @@ setup(
     zip_safe=False,
     extras_require={
         'testing': tests_require,
+        'fast': ['orjson>=3.10'],
     },
     install_requires=requires,
     entry_points={
         'paste.app_factory': [
             'main = honeycomb:main',
         ],
+        'console_scripts': [
+            'honeycomb-migrate = honeycomb.scripts.migrate:main',
+            'honeycomb-check = honeycomb.scripts.check:main',
+            'honeycomb-import = honeycomb.scripts.importer:main',
+        ],
     },
 )
@@ -0,0 +1,72 @@
+from honeycomb.models import BeeHive, Honeycomb, CellText
+from honeycomb.models.analytics import InteractionStats, Sum, stats_for
+from honeycomb.sipping import ZODBSippingStore
+
+
+def record(attempts, completed=False, score=None):
+    stats = {'completado': completed}
+    if score is not None:
+        stats['puntaje'] = score
+    return {'interacciones_previas': [{}] * attempts, 'estadisticas': stats, 'logros': []}
+
+
+def test_stats_follow_record_changes():
+    stats = InteractionStats()
+    stats.apply(None, record(1, score=40))
+    stats.apply(None, record(2, score=95))
+    stats.apply(record(1, score=40), record(3, completed=True, score=60))
+    data = stats.to_dict()
+    assert data['users'] == 2 and data['attempts'] == 5 and data['completions'] == 1
+    assert data['scored_users'] == 2 and data['average_score'] == 77.5
+    counts = {bucket['min']: bucket['count'] for bucket in data['histogram'] if bucket['count']}
+    assert counts == {60: 1, 90: 1}
+
+
+def test_records_without_interactions_count_one_attempt_each():
+    stats = InteractionStats()
+    stats.apply(None, {'logros': []})
+    stats.apply({'logros': []}, {'logros': ['miel']})
+    assert stats.to_dict()['attempts'] == 2 and stats.to_dict()['average_score'] is None
+
+
+def test_sum_resolves_concurrent_changes():
+    assert Sum()._p_resolveConflict(1.5, 4.0, 2.0) == 4.5
+
+
+def test_store_updates_node_and_honeycomb_stats():
+    hive = BeeHive()
+    hc = hive['demo'] = Honeycomb('demo', 'Demo')
+    hc.__parent__ = hive
+    cell = hc['intro'] = CellText('intro', 'Hola')
+    cell.__parent__ = hc
+    hive.add_node(cell)
+    store = ZODBSippingStore(hive)
+    store.put(f'ana:{cell.id}', record(1, score=50))
+    store.put(f'luis:{cell.id}', record(1, completed=True, score=100))
+    store.put(f'ana:{cell.id}', record(2, score=70))
+    node = stats_for(hive, '__node_stats__', str(cell.id)).to_dict()
+    assert node['users'] == 2 and node['attempts'] == 3 and node['average_score'] == 85
+    assert stats_for(hive, '__hc_stats__', 'demo').to_dict() == node
+
+
+def test_honeycomb_stats_count_distinct_users():
+    hive = BeeHive()
+    hc = hive['demo'] = Honeycomb('demo', 'Demo')
+    hc.__parent__ = hive
+    cells = []
+    for name in ('intro', 'juego'):
+        cell = hc[name] = CellText(name, 'Hola')
+        cell.__parent__ = hc
+        hive.add_node(cell)
+        cells.append(cell)
+    store = ZODBSippingStore(hive)
+    for cell in cells:
+        store.put(f'ana:{cell.id}', record(1))
+    store.put(f'luis:{cells[0].id}', record(1))
+    assert stats_for(hive, '__hc_stats__', 'demo').to_dict()['users'] == 2
+    assert stats_for(hive, '__node_stats__', str(cells[0].id)).to_dict()['users'] == 2
+    # Usuarios de un proveedor externo, con ':' en su id
+    for cell in cells:
+        store.put(f'oidc:abc:{cell.id}', record(1))
+    assert stats_for(hive, '__hc_stats__', 'demo').to_dict()['users'] == 3
+    assert stats_for(hive, '__node_stats__', str(cells[1].id)).to_dict()['attempts'] == 2
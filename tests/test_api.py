@@ -0,0 +1,213 @@
+import json
+
+from BTrees._OOBTree import OOBTree
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+import transaction
+import ZODB
+
+from honeycomb.models import BeeHive, CellText, HoneycombGraph
+from honeycomb.views.api import NodeBatchResource, node_payload, page, page_params, fields_param, project
+
+
+def test_page_walks_key_ranges():
+    tree = OOBTree({f'n{i:02}': i for i in range(5)})
+    pairs, cursor = page(tree, None, 2)
+    assert pairs == [('n00', 0), ('n01', 1)] and cursor == 'n01'
+    pairs, cursor = page(tree, cursor, 2)
+    assert pairs == [('n02', 2), ('n03', 3)] and cursor == 'n03'
+    pairs, cursor = page(tree, cursor, 2)
+    assert pairs == [('n04', 4)] and cursor is None
+
+
+def test_page_params_and_projection():
+    request = testing.DummyRequest(params={'limit': '5000', 'cursor': 'demo', 'fields': 'id, title'})
+    assert page_params(request) == ('demo', 1000)
+    assert project({'id': 'a', 'title': 'A', 'icon': None}, fields_param(request)) == {'id': 'a', 'title': 'A'}
+    assert page_params(testing.DummyRequest(params={'limit': '0'}))[1] is None
+    assert fields_param(testing.DummyRequest()) is None
+
+
+def test_batch_get_reports_missing_ids():
+    testing.setUp().include('honeycomb.urls')
+    try:
+        hive = BeeHive()
+        cells = [CellText(f'cell-{i}', 'Hola', title=f'Celda {i}') for i in range(3)]
+        for cell in cells:
+            hive[cell.__name__] = cell
+            hive.add_node(cell)
+        ids = [str(cells[2].id), 'missing', str(cells[0].id), str(cells[2].id)]
+        request = testing.DummyRequest(params={'ids': ','.join(ids)}, root=hive)
+        apply_request_extensions(request)
+        result = NodeBatchResource(request, hive).get()
+        assert [node['id'] for node in result['nodes']] == [str(cells[2].id), str(cells[0].id)]
+        assert result['errors'] == {'missing': 'Node not found'}
+    finally:
+        testing.tearDown()
+
+
+def test_node_payload_is_materialized_until_a_change():
+    config = testing.setUp()
+    config.include('honeycomb.urls')
+    config.include('honeycomb.cache')
+    db = ZODB.DB(None)
+    tm = transaction.TransactionManager()
+    conn = db.open(tm)
+    try:
+        graph_json = json.dumps({
+            'nodes': [{'id': 'a', 'data': {'label': 'A'}}, {'id': 'b', 'data': {'label': 'B'}}],
+            'edges': [{'id': 'edge-ab', 'source': 'a', 'target': 'b'}],
+        })
+        with tm:
+            hive = conn.root()['app_root'] = BeeHive()
+            graph = hive['mapa'] = HoneycombGraph.from_json(graph_json, name='mapa', title='Mapa')
+            graph.__parent__ = hive
+            hive.add_node(graph)
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        node_id = str(graph.id)
+        tag, body = node_payload(request, hive, node_id, graph)
+        assert json.loads(body)['edges'][0]['id'] == 'edge-ab'
+        assert node_payload(request, hive, node_id, graph) == (tag, body)
+        assert node_payload(request, hive, node_id, graph)[1] is body
+
+        with tm:
+            graph.out_edges('a')[0].title = 'poliniza'
+        new_tag, new_body = node_payload(request, hive, node_id, graph)
+        assert new_tag != tag and json.loads(new_body)['edges'][0]['label'] == 'poliniza'
+        assert node_payload(request, hive, node_id, graph, fields={'id'})[0] != new_tag
+
+        with tm:
+            graph.apply_layout()
+        nodes = json.loads(node_payload(request, hive, node_id, graph)[1])['nodes']
+        assert abs(nodes[0]['position']['x'] - nodes[1]['position']['x']) > 100
+    finally:
+        conn.close()
+        db.close()
+        testing.tearDown()
+
+
+def test_neighbours_wait_for_the_background_refresh(tmp_path):
+    from ZODB.FileStorage import FileStorage
+    from honeycomb.models import CellBuilder, Honeycomb, HoneycombExplorer
+    from honeycomb.views.api import NeighboursResource
+    from honeycomb.workers import BackgroundWorker
+
+    config = testing.setUp()
+    config.include('honeycomb.urls')
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    config.registry._zodb_databases = {'': db}
+    config.registry.background_worker = worker = BackgroundWorker()
+    try:
+        with db.transaction() as conn:
+            hive = conn.root()['app_root'] = BeeHive()
+            hc = hive['demo'] = Honeycomb('demo', 'Demo')
+            hc.__parent__ = hive
+            hc.__explorer__ = HoneycombExplorer(hc)
+            for name, axes in (('a', (0, 0, 0)), ('b', (0, 0, 3))):
+                cell = hc[name] = CellText(name, name, title=name)
+                cell.__parent__ = hc
+                CellBuilder.fill_cell(cell, *axes)
+            cell_id = str(hc['a'].id)
+
+        def get():
+            conn = db.open()
+            try:
+                request = testing.DummyRequest(root=conn.root()['app_root'], matchdict={'name': 'demo', 'node_id': cell_id})
+                request._primary_zodb_conn = conn
+                apply_request_extensions(request)
+                return NeighboursResource(request).get()
+            finally:
+                conn.close()
+
+        def wait():
+            for future in list(worker.inflight.values()):
+                future.result(5)
+
+        assert get().status_code == 202
+        wait()
+        response = get()
+        assert [n['label'] for n in response['neighbours']] == ['b'] and not response['stale']
+
+        # Mientras se aplica la celda nueva se responde con la matriz anterior
+        with db.transaction() as conn:
+            hc = conn.root()['app_root']['demo']
+            cell = hc['c'] = CellText('c', 'c', title='c')
+            cell.__parent__ = hc
+            CellBuilder.fill_cell(cell, 0, 0, 1)
+        response = get()
+        assert [n['label'] for n in response['neighbours']] == ['b'] and response['stale']
+        wait()
+        worker.shutdown()
+        response = get()
+        assert [n['label'] for n in response['neighbours']] == ['c', 'b'] and not response['stale']
+    finally:
+        db.close()
+        testing.tearDown()
+
+
+def test_node_tag_changes_with_the_edges_of_a_honeycomb(tmp_path):
+    from ZODB.FileStorage import FileStorage
+    from honeycomb.models import Honeycomb
+
+    config = testing.setUp()
+    config.include('honeycomb.urls')
+    config.include('honeycomb.cache')
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    tm = transaction.TransactionManager()
+    conn = db.open(tm)
+    try:
+        with tm:
+            hive = conn.root()['app_root'] = BeeHive()
+            hc = hive['demo'] = Honeycomb('demo', 'Demo')
+            hc.__parent__ = hive
+            hc_id = str(hc.id)
+            # Varias cubetas: agregar una arista no reescribe el árbol
+            for n in range(200):
+                hive.add_edge(hc_id, {'id': f'e{n:03}', 'source': hc_id, 'target': f't{n}'})
+        request = testing.DummyRequest()
+        apply_request_extensions(request)
+        tag, body = node_payload(request, hive, hc_id, hc)
+        with tm:
+            hive.add_edge(hc_id, {'id': 'e100b', 'source': hc_id, 'target': 'nuevo'})
+        new_tag, new_body = node_payload(request, hive, hc_id, hc)
+        assert new_tag != tag
+        assert len(json.loads(new_body)['edges']) == 201
+    finally:
+        conn.close()
+        db.close()
+        testing.tearDown()
+
+
+def test_search_leaves_out_cells_the_user_cant_view():
+    from pyramid.security import Allowed, Denied
+    from honeycomb.models import Honeycomb
+    from honeycomb.views.api import SearchResource, SuggestResource
+
+    class WalledPolicy:
+        def permits(self, request, context, permission):
+            if permission == 'view' and not getattr(context, '__limits__', None):
+                return Allowed('open cell')
+            return Denied('walled cell')
+
+    config = testing.setUp()
+    config.include('honeycomb.urls')
+    config.set_security_policy(WalledPolicy())
+    try:
+        hive = BeeHive()
+        hc = hive['demo'] = Honeycomb('demo', 'Demo')
+        hc.__parent__ = hive
+        for name in ('abierta', 'amurallada'):
+            cell = hc[name] = CellText(name, 'Miel', title=f'Miel {name}')
+            cell.__parent__ = hc
+            hive.add_node(cell)
+        hc['amurallada'].__limits__ = {'integration': 3}
+
+        request = testing.DummyRequest(root=hive, params={'q': 'miel', 'prefix': 'miel'})
+        apply_request_extensions(request)
+        results = SearchResource(request).get()['results']
+        assert [result['label'] for result in results] == ['Miel abierta']
+        suggestions = SuggestResource(request).get()['suggestions']
+        assert [suggestion['label'] for suggestion in suggestions] == ['Miel abierta']
+    finally:
+        testing.tearDown()
@@ -0,0 +1,171 @@
+import numpy as np
+from scipy import spatial
+
+from honeycomb.models import BeeHive, CellBuilder, CellText, Honeycomb, HoneycombExplorer
+
+
+def make_honeycomb():
+    hive = BeeHive()
+    hc = Honeycomb('demo', 'Demo')
+    hc.__parent__ = hive
+    hive['demo'] = hc
+    hc.__explorer__ = HoneycombExplorer(hc)
+    return hive, hc
+
+
+def add_cell(hive, hc, name, *axes):
+    cell = CellText(name, name)
+    cell.__parent__ = hc
+    hc[name] = cell
+    hive.add_node(cell)
+    CellBuilder.fill_cell(cell, *axes)
+    return cell
+
+
+def full_matrix(explorer):
+    coords = np.array([node.__axes__ for node in explorer.names], dtype=float)
+    return spatial.distance.cdist(coords, coords)
+
+
+def test_matrix_follows_cell_changes():
+    hive, hc = make_honeycomb()
+    explorer = hc.__explorer__
+    a = add_cell(hive, hc, 'a', 0, 0, 0)
+    b = add_cell(hive, hc, 'b', 3, 4, 0)
+    c = add_cell(hive, hc, 'c', 1, 1, 1)
+    assert explorer.dirty
+    explorer.refresh()
+    assert not explorer.dirty
+    rows = explorer.members
+    assert explorer.matrix[rows[str(a.id)], rows[str(b.id)]] == 5
+    np.testing.assert_allclose(explorer.matrix, full_matrix(explorer), rtol=1e-6)
+
+    CellBuilder.fill_cell(a, 3, 4, 12)
+    explorer.refresh()
+    np.testing.assert_allclose(explorer.matrix, full_matrix(explorer), rtol=1e-6)
+
+    hive.remove_node(str(b.id))
+    explorer.refresh()
+    assert explorer.etag.endswith('-3')
+    assert sorted(node.__name__ for node in explorer.names) == ['a', 'c']
+    assert sorted(explorer.members.values()) == [0, 1]
+    assert explorer.names[explorer.members[str(c.id)]] is c
+    np.testing.assert_allclose(explorer.matrix, full_matrix(explorer), rtol=1e-6)
+
+
+def test_legacy_explorer_rebuild():
+    hive, hc = make_honeycomb()
+    explorer = hc.__explorer__
+    del explorer.members
+    add_cell(hive, hc, 'a', 0, 0, 0)
+    add_cell(hive, hc, 'b', 0, 0, 2)
+    assert explorer.matrix is None
+
+    explorer.update_matrix()
+    assert explorer.matrix.shape == (2, 2)
+    assert explorer.matrix[0, 1] == 2
+    assert len(explorer.members) == 2
+
+
+def test_neighbours_and_radius():
+    hive, hc = make_honeycomb()
+    explorer = hc.__explorer__
+    a = add_cell(hive, hc, 'a', 0, 0, 0)
+    add_cell(hive, hc, 'b', 0, 0, 3)
+    add_cell(hive, hc, 'c', 0, 0, 1)
+    add_cell(hive, hc, 'd', 0, 0, 10)
+    explorer.refresh()
+
+    nearest = explorer.neighbours(a.id, k=2)
+    assert [(cell.__name__, distance) for cell, distance in nearest] == [('c', 1.0), ('b', 3.0)]
+    assert len(explorer.neighbours(a.id, k=10)) == 3
+
+    close = explorer.within(a.id, 3)
+    assert [cell.__name__ for cell, distance in close] == ['c', 'b']
+    assert explorer.neighbours('missing') is None
+
+
+def test_matrix_stored_condensed_float32():
+    hive, hc = make_honeycomb()
+    explorer = hc.__explorer__
+    add_cell(hive, hc, 'a', 0, 0, 0)
+    add_cell(hive, hc, 'b', 3, 4, 0)
+    add_cell(hive, hc, 'c', 0, 0, 1)
+    explorer.refresh()
+
+    condensed = explorer.distances.condensed()
+    assert condensed.dtype == np.float32
+    np.testing.assert_allclose(condensed, spatial.distance.pdist(explorer.coords), rtol=1e-6)
+
+    explorer.update_matrix()
+    np.testing.assert_allclose(explorer.distances.condensed(), condensed)
+
+
+class Drone:
+    def __init__(self, **stats):
+        self.stats = stats
+
+    def get_stats(self, key=None):
+        return self.stats.get(key) if key else self.stats
+
+
+def test_visible_cells_batch_check():
+    hive, hc = make_honeycomb()
+    builder = CellBuilder()
+    for name in ('open', 'easy', 'hard'):
+        add_cell(hive, hc, name, 0, 0, 0)
+    builder.set_walls(hc['easy'], {'integration': 1})
+    builder.set_walls(hc['hard'], {'integration': 1, 'problem_solving': 5})
+
+    def visible(user):
+        return [name for name, cell in CellBuilder.visible_cells(hc, user)]
+
+    assert visible(Drone(integration=2, problem_solving=5)) == ['easy', 'hard', 'open']
+    assert visible(Drone(integration=2, problem_solving=1)) == ['easy', 'open']
+    assert visible(Drone()) == ['open']
+    assert visible(None) == ['open']
+
+    builder.set_walls(hc['hard'], {'integration': 3})
+    assert visible(Drone(integration=2)) == ['easy', 'open']
+    assert hc.__walls__.limits.shape == (2, 3)
+
+
+def test_cells_set_or_deleted_in_the_honeycomb_are_pending():
+    hive, hc = make_honeycomb()
+    explorer = hc.__explorer__
+    a = add_cell(hive, hc, 'a', 0, 0, 0)
+    explorer.refresh()
+    b = CellText('b', 'b')
+    CellBuilder.fill_cell(b, 0, 0, 2)
+    hc['b'] = b
+    assert explorer.dirty
+    explorer.refresh()
+    assert explorer.neighbours(a.id, k=1) == [(b, 2.0)]
+    del hc['b']
+    explorer.refresh()
+    assert explorer.neighbours(a.id) == [] and len(explorer.names) == 1
+
+
+def test_walls_follow_the_cells_of_the_container():
+    hive, hc = make_honeycomb()
+    builder = CellBuilder()
+    # Límites puestos antes de guardar la celda
+    walled = CellText('walled', 'walled')
+    builder.set_walls(walled, {'integration': 3})
+    walled.__parent__ = hc
+    hc['walled'] = walled
+    assert hc.__walls__.names == ['walled']
+
+    # Una celda nueva con el mismo nombre no hereda los límites
+    hc['walled'] = CellText('walled', 'walled')
+    assert hc.__walls__.names == []
+    assert [name for name, cell in CellBuilder.visible_cells(hc, None)] == ['walled']
+
+    builder.set_walls(hc['walled'], {'integration': 3})
+    del hc['walled']
+    assert hc.__walls__.names == []
+
+    cell = add_cell(hive, hc, 'gone', 0, 0, 0)
+    builder.set_walls(cell, {'integration': 3})
+    hive.remove_node(str(cell.id))
+    assert hc.__walls__.names == []
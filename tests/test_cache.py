@@ -0,0 +1,44 @@
+import transaction
+import ZODB
+
+from honeycomb.cache import LRUCache, state_tag
+from honeycomb.models import Honeycomb, CellText
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    assert cache.get('a') == b'1'
+    cache.put('c', b'3')
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+
+
+def test_lru_bounds_total_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put('a', b'x' * 6)
+    cache.put('b', b'x' * 6)
+    assert len(cache) == 1 and cache.size == 6
+    cache.put('huge', b'x' * 11)
+    assert 'huge' not in cache
+
+
+def test_state_tag_follows_commits():
+    db = ZODB.DB(None)
+    with db.transaction() as conn:
+        hc = conn.root()['hc'] = Honeycomb('demo', 'Demo')
+        hc['intro'] = CellText('intro', 'Hola')
+        assert state_tag([hc, hc['intro']]) is None
+
+    conn = db.open()
+    hc = conn.root()['hc']
+    tag = state_tag([hc, hc['intro']], 'http://example.com')
+    assert tag == state_tag([hc, hc['intro']], 'http://example.com')
+    assert tag != state_tag([hc, hc['intro']], 'http://other.example.com')
+
+    hc['intro'].title = 'Bienvenida'
+    assert state_tag([hc, hc['intro']]) is None
+    transaction.commit()
+    assert state_tag([hc, hc['intro']], 'http://example.com') != tag
+    conn.close()
+    db.close()
@@ -0,0 +1,53 @@
+from honeycomb.models import BeeHive, CellRichText, CellText
+from honeycomb.models.catalog import TextIndex, normalize, tokenize
+
+
+def test_tokenize_spanish():
+    assert normalize('Zángano Óvulos') == 'zangano ovulos'
+    assert tokenize('La reina de las abejas') == ['reina', 'abejas']
+
+
+def test_search_ranks_and_paginates():
+    index = TextIndex()
+    index.index('1', 'Abeja reina', 'La reina pone huevos')
+    index.index('2', 'Obrera', 'Alimenta a la reina')
+    index.index('3', 'Zángano', 'Fecunda a la reina durante el vuelo nupcial')
+
+    total, hits = index.search('reina')
+    assert total == 3
+    assert hits[0][0] == '1'
+
+    total, hits = index.search('zangano vuelo', start=0, size=1)
+    assert total == 1 and [node_id for node_id, score in hits] == ['3']
+    assert index.search('reina', start=2, size=5)[1][0][0] in {'2', '3'}
+
+    index.unindex('1')
+    assert index.search('huevos') == (0, [])
+    assert len(index) == 2
+
+
+def test_suggest_title_prefix():
+    index = TextIndex()
+    index.index('1', 'Ciclo reproductivo', '')
+    index.index('2', 'Cera', '')
+    index.index('3', 'Ácaros', '')
+    assert index.suggest('ci') == ['1']
+    assert sorted(index.suggest('c')) == ['1', '2']
+    assert index.suggest('aca') == ['3']
+
+
+def test_beehive_keeps_catalog_updated():
+    hive = BeeHive()
+    text = CellText('intro', 'Bienvenida al panal', title='Introducción')
+    rich = CellRichText('miel', '<p>La <b>miel</b> se produce...</p>', title='Miel')
+    hive.add_node(text)
+    hive.add_node(rich)
+    assert hive.__catalog__.search('miel')[1][0][0] == str(rich.id)
+
+    text.contents = 'Texto nuevo sobre polen'
+    hive.reindex_node(text)
+    assert hive.__catalog__.search('polen')[1][0][0] == str(text.id)
+    assert hive.__catalog__.search('bienvenida')[0] == 0
+
+    hive.remove_node(str(rich.id))
+    assert hive.__catalog__.search('miel')[0] == 0
@@ -0,0 +1,93 @@
+import pytest
+import transaction
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.models import BeeHive, Honeycomb, CellText
+from honeycomb.models.changes import MAX_CHANGES, changes_since, format_tid, parse_tid
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    yield db
+    db.close()
+
+
+def commit(db, change):
+    tm = transaction.TransactionManager()
+    conn = db.open(tm)
+    try:
+        with tm:
+            change(conn.root())
+    finally:
+        conn.close()
+    return db.lastTransaction()
+
+
+def add_cell(hive, hc_name, name):
+    hc = hive[hc_name]
+    cell = hc[name] = CellText(name, 'Hola', title=name)
+    cell.__parent__ = hc
+    hive.add_node(cell)
+    hive.add_edge(str(hc.id), {'source': str(hc.id), 'target': str(cell.id), 'id': f'{name}-edge'})
+    return str(cell.id)
+
+
+def setup_hive(root):
+    hive = root['app_root'] = BeeHive()
+    for name in ('demo', 'abejas'):
+        hc = hive[name] = Honeycomb(name, name.title())
+        hc.__parent__ = hive
+
+
+def test_feed_lists_changes_after_tid(db):
+    start = commit(db, setup_hive)
+    ids = {}
+    commit(db, lambda root: ids.setdefault('intro', add_cell(root['app_root'], 'demo', 'intro')))
+    second = commit(db, lambda root: ids.setdefault('reina', add_cell(root['app_root'], 'abejas', 'reina')))
+    commit(db, lambda root: root['app_root'].remove_node(ids['intro']))
+
+    changes, cursor = changes_since(db, start)
+    assert cursor == db.lastTransaction()
+    assert [(c['type'], c['op'], c['id']) for c in changes] == [
+        ('node', 'upsert', ids['intro']), ('edge', 'upsert', 'intro-edge'),
+        ('node', 'upsert', ids['reina']), ('edge', 'upsert', 'reina-edge'),
+        ('node', 'delete', ids['intro']), ('edge', 'delete', 'intro-edge'),
+    ]
+    assert changes[2]['tid'] == format_tid(second) and changes[3]['honeycomb'] == 'abejas'
+
+    only_demo, _ = changes_since(db, start, honeycomb='demo')
+    assert {c['honeycomb'] for c in only_demo} == {'demo'} and len(only_demo) == 4
+    assert changes_since(db, cursor) == ([], cursor)
+
+
+def test_feed_pages_by_whole_transactions(db):
+    start = commit(db, setup_hive)
+    for name in ('a', 'b', 'c'):
+        commit(db, lambda root: add_cell(root['app_root'], 'demo', name))
+    changes, cursor = changes_since(db, start, limit=3)
+    assert len(changes) == 4 and cursor == parse_tid(changes[-1]['tid'])
+    rest, last = changes_since(db, cursor, limit=3)
+    assert len(rest) == 2 and last == db.lastTransaction()
+
+
+def test_large_transactions_record_a_resync(db):
+    start = commit(db, setup_hive)
+
+    def add_many(root):
+        for i in range(MAX_CHANGES):
+            add_cell(root['app_root'], 'abejas', f'celda-{i}')
+        add_cell(root['app_root'], 'demo', 'intro')
+    commit(db, add_many)
+    changes, _ = changes_since(db, start)
+    assert [(c['type'], c['op'], c['id']) for c in changes] == [
+        ('honeycomb', 'resync', 'abejas'), ('node', 'upsert', changes[1]['id']), ('edge', 'upsert', 'intro-edge'),
+    ]
+
+
+def test_parse_tid():
+    assert parse_tid(format_tid(b'\x00' * 7 + b'\x01')) == b'\x00' * 7 + b'\x01'
+    for value in ('xyz', '00ff'):
+        with pytest.raises(ValueError):
+            parse_tid(value)
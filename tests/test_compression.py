@@ -0,0 +1,68 @@
+import gzip
+import zlib
+
+import pytest
+from webob import Request
+
+from honeycomb import CompressionMiddleware, _accepted_encoding
+
+
+def make_app(body, content_type='application/json', headers=(), lazy=False):
+    def app(environ, start_response):
+        response_headers = [('Content-Type', content_type), ('ETag', '"v1"'), *headers]
+        if lazy:
+            def chunks():
+                start_response('200 OK', response_headers)
+                yield body[:10]
+                yield body[10:]
+            return chunks()
+        start_response('200 OK', response_headers + [('Content-Length', str(len(body)))])
+        return [body[:10], body[10:]]
+    return app
+
+
+def get(app, accept_encoding):
+    # Sin webtest, que decodifica el cuerpo comprimido por su cuenta
+    return Request.blank('/', headers={'Accept-Encoding': accept_encoding}).get_response(app)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('deflate', 'deflate'),
+    ('gzip;q=0, deflate;q=0.5', 'deflate'),
+    ('*', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_accepted_encoding(header, expected):
+    assert _accepted_encoding({'HTTP_ACCEPT_ENCODING': header}) == expected
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_gzip_streamed_body(lazy):
+    body = b'{"nodes": [' + b'{"id": "abc"}, ' * 200 + b'{}]}'
+    app = CompressionMiddleware(make_app(body, lazy=lazy), threshold=100)
+    response = get(app, 'gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"v1"'
+    assert gzip.decompress(response.body) == body
+
+
+def test_deflate_is_zlib_wrapped():
+    body = b'<html>' + b'panal ' * 500 + b'</html>'
+    response = get(CompressionMiddleware(make_app(body, 'text/html; charset=UTF-8')), 'deflate')
+    assert zlib.decompress(response.body) == body
+
+
+@pytest.mark.parametrize('body, content_type, headers, accept', [
+    (b'{"small": true}', 'application/json', (), 'gzip'),
+    (b'x' * 5000, 'image/png', (), 'gzip'),
+    (b'x' * 5000, 'application/json', (('Content-Encoding', 'br'),), 'gzip'),
+    (b'x' * 5000, 'text/event-stream', (), 'gzip'),
+    (b'x' * 5000, 'application/json', (), 'identity'),
+])
+def test_uncompressed_responses(body, content_type, headers, accept):
+    response = get(CompressionMiddleware(make_app(body, content_type, headers)), accept)
+    assert response.headers.get('Content-Encoding') in (None, 'br')
+    assert response.body == body
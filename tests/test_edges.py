@@ -0,0 +1,71 @@
+import threading
+
+import transaction
+import ZODB
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+
+from honeycomb.models import BeeHive, CellText
+from honeycomb.models.edges import EdgeSet
+
+
+def test_concurrent_add_and_remove_merge(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        conn.root()['edges'] = EdgeSet([{'id': 'a'}, {'id': 'b'}])
+    managers = [transaction.TransactionManager() for n in range(2)]
+    edges = [db.open(tm).root()['edges'] for tm in managers]
+    edges[0].add({'id': 'c'})
+    # Las cubetas no resuelven el borrado de su primera llave
+    edges[1].discard('b')
+    for tm in managers:
+        tm.commit()
+    with db.transaction() as conn:
+        merged = conn.root()['edges']
+        assert [edge['id'] for edge in merged] == ['a', 'c'] and len(merged) == 2
+    db.close()
+
+
+def test_concurrent_edges_from_same_source(tmp_path):
+    writers = 8
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        hive = conn.root()['app_root'] = BeeHive()
+        cell = CellText('intro', 'Hola')
+        hive.add_node(cell)
+        source_id = str(cell.id)
+        hive.add_edge(source_id, {'id': 'first', 'source': source_id, 'target': 'x'})
+
+    barrier = threading.Barrier(writers)
+    retries = []
+
+    def writer(n):
+        tm = transaction.TransactionManager()
+        conn = db.open(tm)
+        try:
+            for attempt in range(5):
+                tm.begin()
+                hive = conn.root()['app_root']
+                hive.add_edge(source_id, {'id': f'edge-{n}', 'source': source_id, 'target': f't{n}'})
+                if attempt == 0:
+                    barrier.wait()
+                try:
+                    tm.commit()
+                    return
+                except ConflictError:
+                    tm.abort()
+                    retries.append(n)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with db.transaction() as conn:
+        edges = conn.root()['app_root'].__edges__[source_id]
+        assert len(edges) == writers + 1
+    db.close()
+    assert retries == []
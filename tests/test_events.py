@@ -0,0 +1,66 @@
+import pytest
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.events import EventQueue, QueueFull
+from honeycomb.models import BeeHive
+from honeycomb.sipping import ZODBSippingStore, record_interaction
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        record_interaction(conn.root().setdefault('app_root', BeeHive()), 'anon:n0', {'v': 0})
+    yield db
+    db.close()
+
+
+def stored(db, key):
+    with db.transaction() as conn:
+        return ZODBSippingStore(conn.root()['app_root']).get(key)
+
+
+def test_batch_is_one_transaction(db):
+    queue = EventQueue(db, record_interaction, batch_size=100, flush_interval=60)
+    before = len(db.undoLog(0, 100))
+    for n in range(50):
+        queue.put(f'anon:n{n % 10}', {'v': n})
+    assert queue.get('anon:n3') == {'v': 43}
+    assert queue.flush() == 50
+    queue.close()
+    assert len(db.undoLog(0, 100)) == before + 1
+    assert stored(db, 'anon:n3') == {'v': 43}
+    assert queue.get('anon:n3') is None
+    metrics = queue.metrics()
+    assert metrics['committed'] == 50 and metrics['batches'] == 1 and metrics['depth'] == 0
+
+
+def test_batch_is_replayed_after_conflict(db):
+    attempts = []
+
+    def apply(root, key, value):
+        if not attempts:
+            # Otra transacción modifica el mismo registro antes del commit del lote
+            with db.transaction() as conn:
+                record_interaction(conn.root()['app_root'], key, {'v': 'concurrente'})
+        attempts.append(key)
+        record_interaction(root, key, value)
+
+    queue = EventQueue(db, apply, flush_interval=60)
+    queue.put('anon:n0', {'v': 1})
+    assert queue.flush() == 1
+    queue.close()
+    assert len(attempts) == 2 and queue.metrics()['conflicts'] == 1
+    assert stored(db, 'anon:n0') == {'v': 1}
+
+
+def test_full_queue_rejects_events(db):
+    queue = EventQueue(db, record_interaction, flush_interval=60, max_depth=2)
+    queue.put('anon:n1', {})
+    queue.put('anon:n2', {})
+    with pytest.raises(QueueFull):
+        queue.put('anon:n3', {})
+    queue.close()
+    assert queue.metrics()['rejected'] == 1
+    assert stored(db, 'anon:n2') == {}
@@ -0,0 +1,52 @@
+import transaction
+import ZODB
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+
+from honeycomb.models import BeeHive, Honeycomb, CellText
+from honeycomb.views.default import beehive_view, honeycomb
+
+
+def setup_module():
+    config = testing.setUp()
+    config.include('pyramid_jinja2')
+    config.include('honeycomb.cache')
+    config.include('honeycomb.urls')
+
+
+def teardown_module():
+    testing.tearDown()
+
+
+def make_request(context, **kwargs):
+    request = testing.DummyRequest(context=context, **kwargs)
+    apply_request_extensions(request)
+    return request
+
+
+def test_fragments_follow_serials_and_prefix():
+    db = ZODB.DB(None)
+    tm = transaction.TransactionManager()
+    conn = db.open(tm)
+    with tm:
+        hive = conn.root()['app_root'] = BeeHive()
+        hc = hive['demo'] = Honeycomb('demo', 'Demo')
+        hc.__parent__ = hive
+        cell = hc['intro'] = CellText('intro', 'Hola', title='Introducción')
+        cell.__parent__ = hc
+
+    first = beehive_view(hive, make_request(hive))['honeycombs']
+    assert 'Introducción' in first[0] and 'http://example.com/demo/intro/' in first[0]
+    request = make_request(hive)
+    request.node_url = None  # Sin cambios no se vuelven a calcular URLs
+    assert beehive_view(hive, request)['honeycombs'] == first
+    assert 'http://example.com/demo/intro"' in honeycomb(make_request(hc))['cells']
+
+    with tm:
+        cell.title = 'Bienvenida'
+    assert 'Bienvenida' in beehive_view(hive, make_request(hive))['honeycombs'][0]
+    assert 'Bienvenida' in honeycomb(make_request(hc))['cells']
+    prefixed = make_request(hive, application_url='http://example.com/panal')
+    assert 'http://example.com/panal/demo/intro/' in beehive_view(hive, prefixed)['honeycombs'][0]
+    conn.close()
+    db.close()
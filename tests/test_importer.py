@@ -0,0 +1,61 @@
+import io
+import json
+
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.models import BeeHive, Honeycomb, importer
+from honeycomb.models.folder import BTreeList
+from honeycomb.models.importer import import_graph, iter_graph
+
+
+def graph_document(n=10):
+    return {
+        'viewport': {'x': 12.5, 'zoom': 1},
+        # Las aristas antes que los nodos: se resuelven al final
+        'edges': [{'id': f'e{i}', 'source': f'n{i}', 'target': f'n{i + 1}', 'label': 'sigue'} for i in range(n - 1)]
+                 + [{'id': 'dangling', 'source': 'n0', 'target': 'missing'}],
+        'nodes': [{'id': f'n{i}', 'type': 'custom', 'data': {'label': f'Nodo «{i}»'}} for i in range(n)],
+        'version': 12345,
+    }
+
+
+def test_iter_graph_streams_items_in_small_chunks():
+    document = graph_document()
+    text = json.dumps(document, indent=2, ensure_ascii=False)
+    items = list(iter_graph(io.StringIO(text), chunk_size=7))
+    assert [data for kind, data in items if kind == 'node'] == document['nodes']
+    assert [data for kind, data in items if kind == 'edge'] == document['edges']
+    assert list(iter_graph(io.StringIO('{"nodes": [], "edges": []}'))) == []
+
+
+def test_import_graph_commits_in_batches_and_resumes(tmp_path, monkeypatch):
+    # Las aristas en espera pasan a disco
+    monkeypatch.setattr(importer, 'PENDING_BYTES', 64)
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    conn = db.open()
+    tm = conn.transaction_manager
+    with tm:
+        hive = conn.root()['app_root'] = BeeHive()
+        hc = hive['demo'] = Honeycomb('demo', 'Demo')
+        hc.__parent__ = hive
+    text = json.dumps(graph_document())
+    reports = []
+    last = db.lastTransaction()
+
+    graph, stats = import_graph(hive, hc, io.StringIO(text), 'mapa', 'Mapa', batch_size=4, savepoint_size=2,
+                                progress=lambda stats: reports.append(stats.items))
+    assert (stats.nodes, stats.edges, stats.skipped) == (10, 9, 1)
+    assert reports == [4, 8, 12, 16, 20, 20]
+    assert db.lastTransaction() != last
+    assert graph.title == 'Mapa' and graph._p_oid is not None
+    assert [str(edge.to_node.id) for edge in graph.out_edges('n3')] == ['n4']
+    assert hive.__nodes__[str(graph.id)] is graph
+    assert hive.__catalog__.search('Nodo')[0] == 10
+
+    graph, stats = import_graph(hive, hc, io.StringIO(text), 'mapa', batch_size=4)
+    assert (stats.nodes, stats.edges, stats.skipped) == (0, 0, 20)
+    assert len(graph.nodes) == 10 and len(graph.edges) == 9
+    assert isinstance(graph.nodes, BTreeList) and graph.nodes[-1].id == 'n9'
+    conn.close()
+    db.close()
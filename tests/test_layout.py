@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+from scipy.spatial.distance import pdist
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.models import BeeHive, CellEdge, CellNode, Honeycomb, HoneycombGraph
+from honeycomb.models.layout import EDGE_LENGTH, graph_distances, pivot_layout, stress_layout
+from honeycomb.workers import BackgroundWorker
+
+
+def test_stress_layout_keeps_graph_distances():
+    coords = stress_layout(4, [(0, 1), (1, 2), (2, 3)])
+    # Un camino queda sobre una recta, con las aristas del largo pedido
+    assert np.allclose(pdist(coords)[[0, 3, 5]] / EDGE_LENGTH, 1, atol=0.01)
+    assert np.allclose(np.linalg.norm(coords[0] - coords[3]) / EDGE_LENGTH, 3, atol=0.01)
+    assert np.array_equal(coords, stress_layout(4, [(0, 1), (1, 2), (2, 3)]))
+    assert graph_distances(3, [(0, 1)])[0, 2] == 2
+    assert stress_layout(1, []).shape == (1, 2)
+
+
+def test_pivot_layout_places_large_graphs():
+    n = 1500
+    coords = pivot_layout(n, [(i, i + 1) for i in range(n - 1)])
+    assert np.allclose(np.linalg.norm(coords[1:] - coords[:-1], axis=1) / EDGE_LENGTH, 1, atol=0.01)
+    assert np.isclose(np.linalg.norm(coords[0] - coords[-1]) / EDGE_LENGTH, n - 1, rtol=0.01)
+    # Ni las componentes ni las hojas de una estrella quedan encimadas
+    pairs = [(i, i + 1) for i in range(99)] + [(0, 2000 + i) for i in range(2000)]
+    coords = pivot_layout(5000, pairs)
+    assert np.isfinite(coords).all() and len(np.unique(coords.round(1), axis=0)) == 5000
+    assert np.allclose(np.linalg.norm(coords[1:100] - coords[:99], axis=1) / EDGE_LENGTH, 1, atol=0.01)
+
+
+def graph_json():
+    return json.dumps({
+        'nodes': [{'id': f'n{i}', 'type': 'custom', 'data': {'label': f'Nodo {i}'}} for i in range(4)],
+        'edges': [{'id': f'e{i}', 'source': f'n{i}', 'target': f'n{i + 1}'} for i in range(3)],
+    })
+
+
+def test_layout_runs_in_the_worker_after_edits(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        hive = conn.root()['app_root'] = BeeHive()
+        hc = hive['demo'] = Honeycomb('demo', 'Demo')
+        hc.__parent__ = hive
+        graph = hc['graph'] = HoneycombGraph.from_json(graph_json())
+        graph.__parent__ = hc
+    oid = graph._p_oid
+    assert graph.layout_dirty
+
+    worker = BackgroundWorker()
+    worker.submit(db, ('layout', oid), oid, HoneycombGraph.apply_layout).result(5)
+    with db.transaction() as conn:
+        graph = conn.get(oid)
+        assert not graph.layout_dirty
+        positions = [graph.get_node_by_id(f'n{i}').position for i in range(4)]
+        assert all(set(position) == {'x', 'y'} for position in positions)
+        extra = CellNode('extra', title='Extra')
+        extra.id = 'n4'
+        graph.add_node(extra)
+        graph.add_edge(CellEdge('edge-4', '', graph.get_node_by_id('n3'), extra))
+        assert graph.layout_dirty
+
+    worker.submit(db, ('layout', oid), oid, HoneycombGraph.apply_layout).result(5)
+    worker.shutdown()
+    with db.transaction() as conn:
+        graph = conn.get(oid)
+        assert not graph.layout_dirty
+        assert graph.get_node_by_id('n4').position
+    db.close()
+
+
+def test_graphs_over_max_nodes_get_a_pivot_layout(monkeypatch):
+    from honeycomb.models import beehive
+    monkeypatch.setattr(beehive, 'MAX_NODES', 2)
+    graph = HoneycombGraph.from_json(graph_json())
+    graph.apply_layout()
+    positions = [graph.get_node_by_id(f'n{i}').position for i in range(4)]
+    assert not graph.layout_dirty
+    assert len({(position['x'], position['y']) for position in positions}) == 4
+
+
+def test_commits_ask_for_a_layout_once(tmp_path):
+    import io
+    from honeycomb.models import beehive
+    from honeycomb.models.importer import import_graph
+
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    asked = []
+    beehive.layout_listeners.append(asked.append)
+    try:
+        conn = db.open()
+        with conn.transaction_manager:
+            hive = conn.root()['app_root'] = BeeHive()
+            hc = hive['demo'] = Honeycomb('demo', 'Demo')
+            hc.__parent__ = hive
+        # Sólo el último de los lotes pide el layout
+        graph, stats = import_graph(hive, hc, io.StringIO(graph_json()), 'mapa', batch_size=2)
+        assert asked == [graph]
+        with conn.transaction_manager:
+            extra = CellNode('extra', title='Extra')
+            extra.id = 'n4'
+            graph.add_node(extra)
+            graph.add_edge(CellEdge('edge-4', '', graph.get_node_by_id('n3'), extra))
+        assert asked == [graph, graph]
+        conn.close()
+    finally:
+        beehive.layout_listeners.remove(asked.append)
+        db.close()
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+import transaction
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.live import ChangeBroker, TooManySubscribers
+from honeycomb.models import BeeHive, Honeycomb, CellText, changes
+
+
+def events(chunks):
+    "Parses the events of a stream into (name, data) pairs, comments as ('comment', text)"
+    parsed = []
+    for chunk in chunks:
+        text = chunk.decode('utf-8').strip()
+        if text.startswith(':'):
+            parsed.append(('comment', text[1:].strip()))
+        elif text.startswith('event:'):
+            fields = dict(line.split(': ', 1) for line in text.splitlines())
+            parsed.append((fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def test_changes_reach_only_their_honeycomb():
+    broker = ChangeBroker(heartbeat=0.01, max_duration=0.05)
+    demo, other = broker.subscribe('demo'), broker.subscribe('abejas')
+    broker.publish(b'\x00' * 7 + b'\x02', [
+        {'type': 'node', 'op': 'upsert', 'id': 'n1', 'honeycomb': 'demo'},
+        {'type': 'node', 'op': 'upsert', 'id': 'n2', 'honeycomb': None},
+    ])
+    stream = broker.stream(demo, b'\x00' * 7 + b'\x01')
+    found = events(stream)
+    assert found[0] == ('ready', {'tid': '0000000000000001'})
+    assert found[1] == ('change', {'tid': '0000000000000002', 'changes': [
+        {'type': 'node', 'op': 'upsert', 'id': 'n1', 'honeycomb': 'demo'}]})
+    assert ('comment', 'heartbeat') in found[2:]
+    stream.close()
+    assert other.events.empty() and broker.count == 1
+
+
+def test_slow_subscriber_is_reset():
+    broker = ChangeBroker(queue_size=2, heartbeat=0.01, max_duration=1)
+    subscription = broker.subscribe('demo')
+    for n in range(3):
+        broker.publish(b'\x00' * 8, [{'type': 'node', 'op': 'upsert', 'id': f'n{n}', 'honeycomb': 'demo'}])
+    assert broker.count == 0
+    assert [name for name, data in events(broker.stream(subscription, b'\x00' * 8))] == ['ready', 'reset']
+
+
+def test_subscribers_are_bounded_and_released_unread():
+    broker = ChangeBroker(max_subscribers=1)
+    stream = broker.stream(broker.subscribe('demo'), b'\x00' * 8)
+    with pytest.raises(TooManySubscribers):
+        broker.subscribe('demo')
+    # El servidor cierra el iterador aunque no lo haya recorrido
+    stream.close()
+    broker.subscribe('demo')
+
+
+def test_commit_hook_notifies_listeners(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    received = []
+    changes.listeners.append(lambda tid, found: received.append((tid, found)))
+    try:
+        tm = transaction.TransactionManager()
+        conn = db.open(tm)
+        with tm:
+            hive = conn.root()['app_root'] = BeeHive()
+            hc = hive['demo'] = Honeycomb('demo', 'Demo')
+            hc.__parent__ = hive
+        with tm:
+            cell = hc['intro'] = CellText('intro', 'Hola')
+            cell.__parent__ = hc
+            hive.add_node(cell)
+        tm.begin()
+        hive.add_node(CellText('descartada', 'Adiós'))
+        tm.abort()
+        conn.close()
+        last = db.lastTransaction()
+    finally:
+        changes.listeners.pop()
+        db.close()
+    assert len(received) == 1
+    tid, found = received[0]
+    assert tid == last
+    assert found == [{'type': 'node', 'op': 'upsert', 'id': str(cell.id), 'honeycomb': 'demo'}]
+
+
+def test_listeners_get_the_tid_of_their_own_commit(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    received = []
+    changes.listeners.append(lambda tid, found: received.append(tid))
+    try:
+        tm = transaction.TransactionManager()
+        conn = db.open(tm)
+        with tm:
+            hive = conn.root()['app_root'] = BeeHive()
+
+        def later(success):
+            # Otro commit entre el de la transacción y sus hooks
+            with db.transaction() as other:
+                other.root()['otra'] = 1
+
+        with tm:
+            tm.get().addAfterCommitHook(later)
+            cell = CellText('intro', 'Hola')
+            hive.add_node(cell)
+        assert db.lastTransaction() != cell._p_serial
+        conn.close()
+    finally:
+        changes.listeners.pop()
+        db.close()
+    assert received == [cell._p_serial]
@@ -0,0 +1,122 @@
+import json
+
+from honeycomb.models import BeeHive, CellText, Honeycomb, HoneycombGraph
+
+
+GRAPH = {
+    "nodes": [
+        {"id": "a", "data": {"label": "Abeja reina"}},
+        {"id": "b", "data": {"label": "Obrera"}},
+        {"id": "c", "data": {"label": "Zángano"}},
+    ],
+    "edges": [
+        {"source": "a", "target": "b", "label": "pone"},
+        {"source": "a", "target": "c", "label": "pone"},
+        {"source": "c", "target": "a", "label": "fecunda"},
+    ],
+}
+
+
+def make_graph():
+    return HoneycombGraph.from_json(json.dumps(GRAPH), name="ciclo", title="Ciclo")
+
+
+def test_graph_indexes_lookup():
+    graph = make_graph()
+    assert graph.get_node_by_name('obrera').id == 'b'
+    assert graph.get_node_by_id('c').title == 'Zángano'
+    assert graph.get_node_by_name('missing') is None
+
+
+def test_graph_adjacency():
+    graph = make_graph()
+    assert sorted(edge.to_node.id for edge in graph.out_edges('a')) == ['b', 'c']
+    assert [edge.from_node.id for edge in graph.in_edges('a')] == ['c']
+    assert sorted(node.id for node in graph.neighbours('a')) == ['b', 'c']
+
+
+def test_graph_reindex_legacy():
+    graph = make_graph()
+    for attr in ('__by_name__', '__by_id__', '__out__', '__in__'):
+        delattr(graph, attr)
+    assert graph.get_node_by_name('obrera').id == 'b'
+    assert len(graph.out_edges('a')) == 2
+    graph.reindex()
+    assert graph.get_node_by_id('a').title == 'Abeja reina'
+    assert len(graph.in_edges('b')) == 1
+
+
+def make_hive(*names):
+    hive = BeeHive()
+    cells = {}
+    for name in names:
+        cells[name] = CellText(name, name)
+        hive.add_node(cells[name])
+    return hive, {name: str(cell.id) for name, cell in cells.items()}
+
+
+def link(hive, source, target):
+    hive.add_edge(source, {"id": f"{source}-{target}", "source": source, "target": target})
+
+
+def test_remove_node_cascades():
+    hive, ids = make_hive('a', 'b', 'c')
+    link(hive, ids['a'], ids['b'])
+    link(hive, ids['c'], ids['b'])
+    link(hive, ids['c'], ids['a'])
+    link(hive, ids['b'], ids['c'])
+
+    hive.remove_node(ids['b'])
+
+    assert ids['b'] not in hive.__nodes__
+    assert list(hive.__edges__[ids['a']]) == []
+    assert [edge['target'] for edge in hive.__edges__[ids['c']]] == [ids['a']]
+    assert ids['b'] not in hive.__sources__
+    assert ids['b'] not in hive.__sources__.get(ids['c'], ())
+    assert hive.check_integrity() == []
+
+
+def test_check_integrity_repair():
+    hive, ids = make_hive('a', 'b')
+    link(hive, ids['a'], ids['b'])
+    link(hive, ids['a'], 'ghost')
+    del hive.__sources__
+
+    problems = hive.check_integrity(repair=True)
+
+    assert len(problems) == 2
+    assert [edge['target'] for edge in hive.__edges__[ids['a']]] == [ids['b']]
+    assert hive.check_integrity() == []
+
+
+def test_honeycombs_are_indexed_by_id():
+    hive = BeeHive()
+    hc = hive['demo'] = Honeycomb('demo', 'Demo')
+    assert hive._honeycomb_of(hc.id) == 'demo'
+    # BeeHive guardado antes del índice
+    del hive.__children__
+    assert hive._honeycomb_of(hc.id) == 'demo'
+    del hive['demo']
+    assert hive._honeycomb_of(hc.id) is None
+
+
+def test_folder_mapping_api():
+    hive = BeeHive()
+    hive['b'] = CellText('b', 'B')
+    hive['a'] = CellText('a', 'A')
+    assert len(hive) == 2
+    assert list(hive) == ['a', 'b']
+    assert 'a' in hive and hive.get('z') is None
+    assert list(hive.keys(min='b')) == ['b']
+    hive['a'] = CellText('a', 'A2')
+    assert len(hive) == 2
+    assert hive.pop('a').contents == 'A2'
+    assert len(hive) == 1
+
+
+def test_folder_loads_legacy_state():
+    legacy = Honeycomb.__new__(Honeycomb)
+    legacy.__setstate__({'data': {'intro': CellText('intro', 'Hola')}, 'id': 'x', 'title': 'Demo'})
+    assert len(legacy) == 1
+    assert legacy['intro'].contents == 'Hola'
+    assert legacy.title == 'Demo'
@@ -0,0 +1,44 @@
+import json
+import uuid
+
+import numpy as np
+import pytest
+from pyramid import testing
+
+from honeycomb import renderers
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def backend(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(renderers, 'orjson', None)
+    elif renderers.orjson is None:
+        pytest.skip("orjson isn't installed")
+    return request.param
+
+
+class Cell:
+    def __json__(self, request):
+        return {'title': 'Colmena'}
+
+
+def test_dumps_native_types(backend):
+    node_id = uuid.UUID('12345678-1234-5678-1234-567812345678')
+    value = {'id': node_id, 'coords': np.array([1.5, 2.0]), 'n': np.int64(3), 'label': 'Zángano'}
+    assert json.loads(renderers.dumps(value)) == {
+        'id': str(node_id), 'coords': [1.5, 2.0], 'n': 3, 'label': 'Zángano',
+    }
+
+
+def test_renderer_negotiates_and_uses_adapters(backend):
+    testing.setUp()
+    try:
+        render = renderers.FastJSONRenderer()(None)
+        request = testing.DummyRequest(accept='text/plain')
+        body = render({'cell': Cell(), 'raw': b'miel'}, {'request': request})
+        assert json.loads(body) == {'cell': {'title': 'Colmena'}, 'raw': 'miel'}
+        assert request.response.content_type == 'text/plain'
+        with pytest.raises(TypeError):
+            render({'unknown': object()}, {'request': request})
+    finally:
+        testing.tearDown()
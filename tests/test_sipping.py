@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+import transaction
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.models import BeeHive
+from honeycomb.sipping import SegmentLogStore, ZODBSippingStore
+
+
+def test_zodb_store_creates_tree_on_write():
+    hive = BeeHive()
+    store = ZODBSippingStore(hive)
+    assert store.get('anon:n1', 'missing') == 'missing'
+    store.put('anon:n1', {'logros': ['miel']})
+    assert store.get('anon:n1') == {'logros': ['miel']}
+
+
+def test_zodb_store_concurrent_writes_resolve(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        hive = conn.root()['app_root'] = BeeHive()
+        ZODBSippingStore(hive).put('anon:n1', {'v': 0})
+
+    managers = [transaction.TransactionManager() for n in range(2)]
+    stores = [ZODBSippingStore(db.open(tm).root()['app_root']) for tm in managers]
+    stores[0].put('ana:n1', {'v': 1})
+    stores[1].put('luis:n1', {'v': 2})
+    stores[1].put('anon:n1', {'v': 3})
+    for tm in managers:
+        tm.commit()
+
+    with db.transaction() as conn:
+        store = ZODBSippingStore(conn.root()['app_root'])
+        assert [store.get(key) for key in ('ana:n1', 'luis:n1', 'anon:n1')] == [{'v': 1}, {'v': 2}, {'v': 3}]
+    db.close()
+
+
+@pytest.mark.parametrize('fsync', ['always', 'batch', 'never'])
+def test_segment_log_survives_reopen(tmp_path, fsync):
+    store = SegmentLogStore(str(tmp_path), fsync=fsync, flush_interval=60)
+    store.put('anon:n1', {'v': 1})
+    store.put('anon:n1', {'v': 2})
+    store.put('ana:n1', {'v': 3})
+    assert store.get('anon:n1') == {'v': 2}
+    store.close()
+
+    store = SegmentLogStore(str(tmp_path), fsync=fsync)
+    assert store.get('anon:n1') == {'v': 2} and store.get('ana:n1') == {'v': 3}
+    assert store.get('nadie:n1') is None
+    store.close()
+
+
+def test_segment_log_drops_incomplete_record(tmp_path):
+    store = SegmentLogStore(str(tmp_path), fsync='always')
+    store.put('anon:n1', {'v': 1})
+    store.close()
+    with open(tmp_path / '00000000.log', 'ab') as segment:
+        segment.write(b'{"k":"anon:n2","v":')
+
+    store = SegmentLogStore(str(tmp_path), fsync='always')
+    assert store.get('anon:n2') is None
+    store.put('anon:n3', {'v': 3})
+    store.close()
+    store = SegmentLogStore(str(tmp_path), fsync='always')
+    assert store.get('anon:n1') == {'v': 1} and store.get('anon:n3') == {'v': 3}
+    store.close()
+
+
+def test_segment_log_compacts_superseded_records(tmp_path):
+    store = SegmentLogStore(str(tmp_path), fsync='never', segment_bytes=1024, cache_entries=2)
+    for n in range(200):
+        store.put(f'anon:n{n % 5}', {'n': n})
+        store.flush()
+    assert store.total_bytes <= 2 * store.segment_bytes
+    assert [store.get(f'anon:n{n}')['n'] for n in range(5)] == [195, 196, 197, 198, 199]
+    store.close()
+
+
+def test_segment_log_concurrent_writers(tmp_path):
+    store = SegmentLogStore(str(tmp_path), batch_size=16, flush_interval=0.01)
+
+    def writer(n):
+        for i in range(100):
+            store.put(f'user{n}:n{i}', {'i': i})
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+    store = SegmentLogStore(str(tmp_path))
+    assert len(store.index) == 800
+    assert store.get('user7:n99') == {'i': 99}
+    store.close()
+
+
+def test_logged_store_queues_idempotent_stats(tmp_path):
+    from honeycomb.events import EventQueue
+    from honeycomb.models import CellText, Honeycomb
+    from honeycomb.models.analytics import apply_record, stats_for
+    from honeycomb.sipping import LoggedSippingStore
+
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        hive = conn.root()['app_root'] = BeeHive()
+        hc = hive['demo'] = Honeycomb('demo', 'Demo')
+        hc.__parent__ = hive
+        cell = hc['intro'] = CellText('intro', 'Hola')
+        cell.__parent__ = hc
+        hive.add_node(cell)
+        key = f'ana:{cell.id}'
+    queue = EventQueue(db, apply_record, flush_interval=60)
+    store = LoggedSippingStore(SegmentLogStore(str(tmp_path / 'log'), fsync='always'), queue)
+    record = {'interacciones_previas': [{}], 'estadisticas': {'puntaje': 50}}
+    store.put(key, record)
+    # Una petición reintentada vuelve a escribir el mismo registro
+    store.put(key, record)
+    store.put(key, dict(record, interacciones_previas=[{}, {}]))
+    assert store.get(key)['interacciones_previas'] == [{}, {}]
+    queue.close()
+    store.store.close()
+    with db.transaction() as conn:
+        stats = stats_for(conn.root()['app_root'], '__hc_stats__', 'demo').to_dict()
+    assert stats['users'] == 1 and stats['attempts'] == 2 and stats['scored_users'] == 1
+    db.close()
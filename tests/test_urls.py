@@ -0,0 +1,69 @@
+from pyramid import testing
+from pyramid.request import apply_request_extensions
+from pyramid.traversal import resource_path_tuple as pyramid_path_tuple
+
+from honeycomb.models import BeeHive, Honeycomb, HoneycombGraph, CellNode, CellText
+from honeycomb.urls import resource_path_tuple
+
+
+def attach(parent, child):
+    parent[child.__name__] = child
+    child.__parent__ = parent
+    return child
+
+
+def test_urls_match_resource_url():
+    testing.setUp().include('honeycomb.urls')
+    try:
+        hive = BeeHive()
+        abejas = attach(hive, Honeycomb('abejas', 'Abejas'))
+        mapa = attach(abejas, HoneycombGraph('mapa-sitio', 'Mapa'))
+        nodo = attach(mapa, CellNode('reproducción', title='Reproducción'))
+        ciclo = attach(nodo, HoneycombGraph('ciclo reproductivo', 'Ciclo'))
+        request = testing.DummyRequest(application_url='http://example.com/panal')
+        apply_request_extensions(request)
+        for node in (hive, abejas, mapa, nodo, ciclo):
+            assert resource_path_tuple(node) == pyramid_path_tuple(node)
+            assert request.node_url(node) == request.resource_url(node)
+        assert request.node_url(abejas, 'edit', 'a b') == request.resource_url(abejas, 'edit', 'a b')
+    finally:
+        testing.tearDown()
+
+
+def test_renaming_or_moving_invalidates_the_subtree():
+    hive = BeeHive()
+    abejas = attach(hive, Honeycomb('abejas', 'Abejas'))
+    mapa = attach(abejas, HoneycombGraph('mapa', 'Mapa'))
+    cell = attach(mapa, CellText('intro', 'Hola'))
+    assert resource_path_tuple(cell) == ('', 'abejas', 'mapa', 'intro')
+    hive.rename('abejas', 'panal')
+    assert resource_path_tuple(cell) == ('', 'panal', 'mapa', 'intro')
+    demo = attach(hive, Honeycomb('demo', 'Demo'))
+    del abejas['mapa']
+    attach(demo, mapa)
+    assert resource_path_tuple(cell) == ('', 'demo', 'mapa', 'intro')
+    assert resource_path_tuple(mapa) is resource_path_tuple(mapa)
+
+
+class Watched(Honeycomb):
+    "Cuenta las veces que se lee su padre"
+    reads = 0
+
+    def __getattribute__(self, name):
+        if name == '__parent__':
+            type(self).reads += 1
+        return super().__getattribute__(name)
+
+
+def test_cached_paths_skip_the_ancestors():
+    hive = BeeHive()
+    abejas = attach(hive, Watched('abejas', 'Abejas'))
+    cell = attach(abejas, CellText('intro', 'Hola'))
+    assert resource_path_tuple(cell) == ('', 'abejas', 'intro')
+    Watched.reads = 0
+    for n in range(3):
+        assert resource_path_tuple(cell) == ('', 'abejas', 'intro')
+    assert Watched.reads == 0
+    attach(hive, Honeycomb('demo', 'Demo'))
+    assert resource_path_tuple(cell) == ('', 'abejas', 'intro')
+    assert Watched.reads == 1
@@ -0,0 +1,70 @@
+import threading
+
+import ZODB
+from ZODB.FileStorage import FileStorage
+
+from honeycomb.models import BeeHive, CellBuilder, CellText, Honeycomb, HoneycombExplorer
+from honeycomb.workers import BackgroundWorker
+
+
+def test_background_refresh_is_single_flight(tmp_path):
+    db = ZODB.DB(FileStorage(str(tmp_path / 'Data.fs')))
+    with db.transaction() as conn:
+        hive = conn.root()['app_root'] = BeeHive()
+        hc = hive['demo'] = Honeycomb('demo', 'Demo')
+        hc.__parent__ = hive
+        hc.__explorer__ = HoneycombExplorer(hc)
+        for name, axes in (('a', (0, 0, 0)), ('b', (0, 3, 4))):
+            cell = hc[name] = CellText(name, name)
+            cell.__parent__ = hc
+            CellBuilder.fill_cell(cell, *axes)
+    oid = hc.__explorer__._p_oid
+
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def job(explorer):
+        calls.append(explorer)
+        started.set()
+        release.wait(5)
+        explorer.refresh()
+
+    worker = BackgroundWorker()
+    first = worker.submit(db, oid, oid, job)
+    started.wait(5)
+    second = worker.submit(db, oid, oid, job)
+    release.set()
+    first.result(5)
+    worker.shutdown()
+
+    assert first is second
+    assert len(calls) == 1
+    with db.transaction() as conn:
+        explorer = conn.root()['app_root']['demo'].__explorer__
+        assert not explorer.dirty
+        assert explorer.matrix[0, 1] == 5
+    db.close()
+
+
+def test_submit_does_not_deadlock_on_finished_jobs():
+    from concurrent.futures import Future
+
+    class InlineExecutor:
+        "Runs each job before returning its future, as a fast job on a free thread may"
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+    worker = BackgroundWorker()
+    worker.executor.shutdown()
+    worker.executor = InlineExecutor()
+    worker._run = lambda db, oid, job: job(oid)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(worker.submit(None, 'key', 'oid', str.upper).result()),
+                              daemon=True)
+    thread.start()
+    thread.join(5)
+    assert result == ['OID']
+    assert worker.inflight == {}